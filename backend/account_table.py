@@ -0,0 +1,174 @@
+import copy
+
+import numpy as np
+import pandas as pd
+
+# Bit positions for the label bitmask. Order doubles as display priority:
+# the first set bit becomes a node's primary fraud_type in the UI payload.
+FRAUD_LABELS = (
+    'OFFSHORE_ROUTING',
+    'SMURF_BOSS_UNIFORM', 'SMURF_BOSS', 'SMURF_MULE',
+    'SMURF_TARGET_UNIFORM', 'SMURF_TARGET', 'SMURF_SENDER',
+    'CYCLE', 'VELOCITY_BURST', 'ROUND_TRIP',
+)
+LABEL_BITS = {label: np.uint32(1 << i) for i, label in enumerate(FRAUD_LABELS)}
+
+
+class AccountTable:
+    """Per-account state held in NumPy arrays, indexed by int32 account code."""
+
+    def __init__(self, ids: np.ndarray, country_codes: list[str]):
+        n = len(ids)
+        self.ids = ids                                   # code -> account id string
+        self.country_codes = np.asarray(country_codes)   # country index -> ISO code
+        self.scores = np.zeros(n, dtype=np.int64)
+        self.fraud_count = np.zeros(n, dtype=np.int32)
+        self.labels = np.zeros(n, dtype=np.uint32)
+        self.country = np.zeros(n, dtype=np.int8)
+        self.sent = np.zeros(n, dtype=np.float64)
+        self.received = np.zeros(n, dtype=np.float64)
+        self.label_hits: np.ndarray | None = None     # (account, label) contribution counts, see track_labels
+        self._index: pd.Index | None = None
+
+    def __getstate__(self) -> dict:
+        return {**self.__dict__, "_index": None}   # rebuilt on demand
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def grown(self, ids: np.ndarray, country: np.ndarray) -> 'AccountTable':
+        """A copy with newly seen accounts appended (codes continue from len(self)); this table is left as it was."""
+        n = len(ids)
+        other = copy.copy(self)
+        other.ids = np.concatenate([self.ids, ids])
+        other.country = np.concatenate([self.country, country.astype(np.int8)])
+        for name in ('scores', 'fraud_count', 'labels', 'sent', 'received'):
+            arr = getattr(self, name)
+            setattr(other, name, np.concatenate([arr, np.zeros(n, dtype=arr.dtype)]))
+        if self.label_hits is not None:
+            other.label_hits = np.vstack([self.label_hits, np.zeros((n, len(FRAUD_LABELS)), dtype=self.label_hits.dtype)])
+        if n:
+            other._index = None
+        return other
+
+    def track_labels(self, assigns):
+        """Start counting label contributions so retract() can clear bits.
+
+        The bitmask alone can't tell how many findings set a label, so counts
+        are rebuilt from the (codes, amount, fraud_type) assignments that are
+        still retractable; labels set only once (e.g. by geo risk) count as one.
+        """
+        hits = np.zeros((len(self), len(FRAUD_LABELS)), dtype=np.uint16)
+        for codes, _, fraud_type in assigns:
+            np.add.at(hits[:, FRAUD_LABELS.index(fraud_type)], np.asarray(codes, dtype=np.int64), 1)
+        for i in range(len(FRAUD_LABELS)):
+            hits[:, i] = np.maximum(hits[:, i], (self.labels >> np.uint32(i)) & 1)
+        self.label_hits = hits
+
+    @property
+    def suspicious(self) -> np.ndarray:
+        return self.fraud_count > 0
+
+    def assign(self, codes, amount, fraud_type: str):
+        """Scatter-add points (scalar or one per code) and tag the label; repeated codes accumulate."""
+        codes = np.asarray(codes, dtype=np.int32)
+        np.add.at(self.scores, codes, amount)
+        np.add.at(self.fraud_count, codes, 1)
+        np.bitwise_or.at(self.labels, codes, LABEL_BITS[fraud_type])
+        if self.label_hits is not None:
+            np.add.at(self.label_hits[:, FRAUD_LABELS.index(fraud_type)], codes, 1)
+
+    def retract(self, codes, amount, fraud_type: str):
+        """Undo an earlier assign(); the label bit is cleared once nothing else holds it. Needs track_labels()."""
+        codes = np.asarray(codes, dtype=np.int32)
+        i = FRAUD_LABELS.index(fraud_type)
+        np.subtract.at(self.scores, codes, amount)
+        np.subtract.at(self.fraud_count, codes, 1)
+        np.subtract.at(self.label_hits[:, i], codes, 1)
+        cleared = codes[self.label_hits[codes, i] == 0]
+        self.labels[cleared] &= ~LABEL_BITS[fraud_type]
+
+    def codes_of(self, account_ids) -> np.ndarray:
+        """Map account id strings back to codes (-1 for unknown ids)."""
+        if self._index is None:
+            self._index = pd.Index(self.ids)
+        return self._index.get_indexer(pd.Index(account_ids)).astype(np.int32)
+
+    def label_names(self, code: int) -> list[str]:
+        mask = int(self.labels[code])
+        return [label for i, label in enumerate(FRAUD_LABELS) if mask >> i & 1]
+
+    def label_counts(self, codes: np.ndarray) -> dict[str, int]:
+        masks = self.labels[codes]
+        counts = {}
+        for label, bit in LABEL_BITS.items():
+            hits = int(np.count_nonzero(masks & bit))
+            if hits:
+                counts[label] = hits
+        return counts
+
+    def country_of(self, code: int) -> str:
+        return str(self.country_codes[self.country[code]])
+
+
+class AccountEncoder:
+    """Incremental account id -> int32 code assignment across ingestion chunks.
+
+    The first chunk is encoded by pd.factorize alone (the whole-frame path),
+    in first-seen order over senders then receivers. Later chunks look their
+    unique ids up in a pd.Index of the ids seen so far (a C hash table) and
+    append the unknown ones, so no per-account Python objects are kept.
+    Pickles as the id array alone, the same array ids() hands out.
+    """
+
+    def __init__(self):
+        self._set_ids(np.empty(0, dtype=object))
+
+    def _set_ids(self, ids: np.ndarray):
+        self._ids = ids
+        self._index = pd.Index(ids, dtype=object, copy=False)
+
+    def __getstate__(self) -> dict:
+        return {"_ids": self._ids}   # the index is rebuilt from the ids
+
+    def __setstate__(self, state: dict):
+        self._set_ids(state["_ids"])
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+    def copy(self) -> 'AccountEncoder':
+        """A copy sharing the ids and their index (never written to: encode() replaces both)."""
+        other = AccountEncoder.__new__(AccountEncoder)
+        other._ids, other._index = self._ids, self._index
+        return other
+
+    def encode(self, senders: pd.Series, receivers: pd.Series) -> tuple[np.ndarray, np.ndarray]:
+        local, uniques = pd.factorize(pd.concat([senders, receivers], ignore_index=True))
+        uniques = np.asarray(uniques, dtype=object)
+        if not len(self._ids):
+            glob = np.arange(len(uniques), dtype=np.int32)
+            self._set_ids(uniques)
+        else:
+            glob = self._index.get_indexer(uniques).astype(np.int32)
+            unseen = glob < 0
+            if unseen.any():
+                glob[unseen] = np.arange(len(self._ids), len(self._ids) + np.count_nonzero(unseen), dtype=np.int32)
+                self._set_ids(np.concatenate([self._ids, uniques[unseen]]))
+        codes = glob[local]
+        return codes[:len(senders)], codes[len(senders):]
+
+    def ids(self, start: int = 0) -> np.ndarray:
+        """Account ids by code, from code `start` on (the encoder's own array when start is 0)."""
+        return self._ids[start:] if start else self._ids
+
+
+def hash_countries(ids: np.ndarray, n_high: int, n_std: int) -> np.ndarray:
+    """Country index per account from a stable 64-bit hash of its id.
+
+    ~8% of accounts land in the high-risk block (indices < n_high), the rest
+    in the standard block that follows it. Not memoized across scans: any
+    lookup by id hashes the strings too, and costs more than this.
+    """
+    h = pd.util.hash_array(np.asarray(ids, dtype=object), categorize=False)
+    return np.where(h % 100 < 8, h % n_high, n_high + h % n_std).astype(np.int8)
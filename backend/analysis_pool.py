@@ -0,0 +1,258 @@
+import io
+import multiprocessing
+import pickle
+import time
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+from multiprocessing import shared_memory
+
+import numpy as np
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    PYARROW_AVAILABLE = True
+except ImportError:
+    PYARROW_AVAILABLE = False
+
+from engine import FraudEngine
+
+# Imported once in the fork server, so every worker forks with them loaded
+PRELOAD_MODULES = ['numpy', 'pandas', 'networkx', 'engine', 'analysis_pool']
+SHARE_BLOCK_BYTES = 1 << 20   # read size when copying an upload into shared memory
+SHARED_ARRAY_MIN = 4096       # object arrays (account ids) this long go through shared memory, not the pickle
+
+
+# ── Shared-memory handoff ───────────────────────────────────────────────
+class _Attached(shared_memory.SharedMemory):
+    """An attached block whose close() gives way while Arrow still views it.
+
+    The mapping then lives on in those views and is unmapped with the last of
+    them, instead of close() (and __del__) raising BufferError.
+    """
+
+    def close(self):
+        try:
+            super().close()
+        except BufferError:
+            pass
+
+
+def _attach(name: str) -> shared_memory.SharedMemory:
+    return _Attached(name=name)
+
+
+def share_bytes(data: bytes) -> dict:
+    """Copy bytes into a new shared-memory block; the receiver unlinks it (see taken)."""
+    shm = shared_memory.SharedMemory(create=True, size=max(len(data), 1))
+    shm.buf[:len(data)] = data
+    shm.close()
+    return {"shm": shm.name, "size": len(data)}
+
+
+def share_file(f) -> dict:
+    """Copy a binary file, from its start, into a new shared-memory block a block at a time."""
+    size = f.seek(0, io.SEEK_END)
+    f.seek(0)
+    shm = shared_memory.SharedMemory(create=True, size=max(size, 1))
+    try:
+        pos = 0
+        while pos < size:
+            block = f.read(min(SHARE_BLOCK_BYTES, size - pos))
+            if not block:
+                raise ValueError("Upload ended early")
+            shm.buf[pos:pos + len(block)] = block
+            pos += len(block)
+    except BaseException:
+        shm.close()
+        shm.unlink()
+        raise
+    shm.close()
+    return {"shm": shm.name, "size": size}
+
+
+@contextmanager
+def taken(spec: dict):
+    """A view of a block made by share_bytes/share_file/share_frame, read in place.
+
+    The block is unlinked on entry, so its memory goes once nothing maps it,
+    however the reader ends. Frames parsed from the view may keep zero-copy
+    Arrow views into it (string columns, Arrow IPC uploads): the mapping then
+    stays until those frames are gone.
+    """
+    shm = _attach(spec["shm"])
+    shm.unlink()
+    view = shm.buf[:spec["size"]]
+    try:
+        yield view
+    finally:
+        try:
+            view.release()
+        except BufferError:   # exported to Arrow buffers, which keep the mapping alive
+            pass
+        shm.close()
+
+
+def share_frame(df: pd.DataFrame) -> dict:
+    """Write a DataFrame into a new shared-memory block as an Arrow IPC stream.
+
+    Columns are laid out as Arrow buffers, strings included, so nothing is
+    pickled. Frames Arrow can't represent (object columns of mixed types),
+    or any frame without pyarrow, are pickled into the block instead.
+    """
+    if not PYARROW_AVAILABLE:
+        return _share_pickled(df)
+    try:
+        table = pa.Table.from_pandas(df)
+    except (pa.ArrowInvalid, pa.ArrowTypeError):
+        return _share_pickled(df)   # e.g. object columns mixing ints and strings
+    sizer = pa.MockOutputStream()
+    with pa.ipc.new_stream(sizer, table.schema) as writer:
+        writer.write_table(table)
+    size = sizer.size()
+
+    shm = shared_memory.SharedMemory(create=True, size=max(size, 1))
+    target = pa.FixedSizeBufferWriter(pa.py_buffer(shm.buf))
+    with pa.ipc.new_stream(target, table.schema) as writer:
+        writer.write_table(table)
+    del writer, target   # release the exported view before closing
+    shm.close()
+    return {"shm": shm.name, "size": size, "format": "arrow"}
+
+
+def _share_pickled(df: pd.DataFrame) -> dict:
+    return {**share_bytes(pickle.dumps(df, protocol=pickle.HIGHEST_PROTOCOL)), "format": "pickle"}
+
+
+def take_frame(spec: dict) -> pd.DataFrame:
+    """Rebuild and release a frame made by share_frame, reading the block in place."""
+    with taken(spec) as view:
+        if spec["format"] == "pickle":
+            return pickle.loads(view)
+        return pa.ipc.open_stream(pa.py_buffer(view)).read_all().to_pandas()
+
+
+def share_array(arr: np.ndarray) -> dict:
+    """An object array (e.g. account ids) as a one-column frame in shared memory; see take_array."""
+    return {**share_frame(pd.DataFrame({"values": arr}, copy=False)), "array": True}
+
+
+def take_array(spec: dict) -> np.ndarray:
+    return take_frame(spec)["values"].to_numpy(dtype=object)
+
+
+class _FramePickler(pickle.Pickler):
+    """Pickler that moves every DataFrame and long object array it meets into shared memory (once per object)."""
+
+    def __init__(self, file):
+        super().__init__(file, protocol=pickle.HIGHEST_PROTOCOL)
+        self.shared = {}
+
+    def persistent_id(self, obj):
+        if isinstance(obj, pd.DataFrame):
+            share = share_frame
+        elif isinstance(obj, np.ndarray) and obj.dtype == object and obj.ndim == 1 and len(obj) >= SHARED_ARRAY_MIN:
+            share = share_array
+        else:
+            return None
+        if id(obj) not in self.shared:
+            self.shared[id(obj)] = (obj, share(obj))   # keep obj alive so its id stays unique
+        return self.shared[id(obj)][1]
+
+
+class _FrameUnpickler(pickle.Unpickler):
+    def __init__(self, file):
+        super().__init__(file)
+        self.frames = {}
+
+    def persistent_load(self, spec):
+        if spec["shm"] not in self.frames:
+            self.frames[spec["shm"]] = take_array(spec) if spec.get("array") else take_frame(spec)
+        return self.frames[spec["shm"]]
+
+
+def pack(obj) -> bytes:
+    """Pickle obj with its DataFrames handed over through shared memory; unpack() releases them."""
+    buf = io.BytesIO()
+    _FramePickler(buf).dump(obj)
+    return buf.getvalue()
+
+
+def unpack(data: bytes):
+    return _FrameUnpickler(io.BytesIO(data)).load()
+
+
+# ── Worker entry points ─────────────────────────────────────────────────
+def _preload():
+    for name in PRELOAD_MODULES:
+        __import__(name)
+
+
+def _analyze_upload(raw_spec: dict) -> tuple[dict, bytes]:
+    with taken(raw_spec) as raw:   # parsed in place, never copied out of the block
+        engine = FraudEngine.from_upload(raw)
+    return engine.run_analysis(), pack(engine)
+
+
+def _analyze_frame(packed: bytes) -> tuple[dict, bytes]:
+    engine = FraudEngine(unpack(packed))
+    return engine.run_analysis(), pack(engine)
+
+
+class AnalysisPool:
+    """Runs analyses in worker processes, off the web server's GIL.
+
+    Workers fork from a server that has already imported PRELOAD_MODULES
+    (spawned and warmed by the initializer where fork servers aren't
+    available) and are all started up front. Uploads are copied from their
+    file into shared memory and parsed there in place; the analysed engine
+    comes back with its frames and account ids in shared memory too, so node
+    details and appends keep working on it. Calls block until the analysis
+    is done: run them from a thread.
+    """
+
+    def __init__(self, workers: int):
+        if 'forkserver' in multiprocessing.get_all_start_methods():
+            ctx = multiprocessing.get_context('forkserver')
+            ctx.set_forkserver_preload(PRELOAD_MODULES)
+        else:
+            ctx = multiprocessing.get_context('spawn')
+        self.workers = workers
+        self._pool = ProcessPoolExecutor(max_workers=workers, mp_context=ctx, initializer=_preload)
+        for _ in range(workers):
+            self._pool.submit(_preload)
+
+    def analyze_upload(self, upload) -> tuple[dict, FraudEngine]:
+        """Analyse an uploaded binary file (read from its start)."""
+        start = time.perf_counter()
+        spec = share_file(upload)
+        try:
+            result, packed = self._pool.submit(_analyze_upload, spec).result()
+        except BaseException:
+            _discard(spec)
+            raise
+        return result, _received(packed, start)
+
+    def analyze_frame(self, df: pd.DataFrame) -> tuple[dict, FraudEngine]:
+        start = time.perf_counter()
+        result, packed = self._pool.submit(_analyze_frame, pack(df)).result()
+        return result, _received(packed, start)
+
+    def shutdown(self):
+        self._pool.shutdown(wait=False, cancel_futures=True)
+
+
+def _received(packed: bytes, start: float) -> FraudEngine:
+    engine = unpack(packed)
+    engine.timings.add('process_pool', time.perf_counter() - start)   # queueing, handoff and the worker's run
+    return engine
+
+
+def _discard(spec: dict):
+    """Unlink a block the worker never took (it failed before reading it)."""
+    try:
+        shm = _attach(spec["shm"])
+    except FileNotFoundError:
+        return
+    shm.close()
+    shm.unlink()
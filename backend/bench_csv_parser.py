@@ -0,0 +1,53 @@
+"""Compare the pandas and pyarrow CSV parser backends on a synthetic ledger.
+
+    python bench_csv_parser.py              # 10M rows
+    python bench_csv_parser.py --rows 1000000
+"""
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+from ingest import PYARROW_AVAILABLE, read_csv
+
+
+def write_ledger(path: str, rows: int, seed: int = 7):
+    rng = np.random.default_rng(seed)
+    accounts = np.array([f"ACC_{i:07d}" for i in range(max(rows // 20, 100))])
+    start = np.datetime64('2026-01-01T00:00:00')
+    block = 1_000_000
+    for offset in range(0, rows, block):
+        n = min(block, rows - offset)
+        pd.DataFrame({
+            "transaction_id": [f"TXN_{i}" for i in range(offset, offset + n)],
+            "sender_id": accounts[rng.integers(0, len(accounts), n)],
+            "receiver_id": accounts[rng.integers(0, len(accounts), n)],
+            "amount": rng.uniform(10, 10_000, n).round(2),
+            "timestamp": (start + rng.integers(0, 90 * 86400, n).astype('timedelta64[s]')).astype(str),
+        }).to_csv(path, mode='a' if offset else 'w', header=offset == 0, index=False)
+
+
+def bench(path: str, backend: str) -> float:
+    t0 = time.perf_counter()
+    df = read_csv(path, backend)
+    elapsed = time.perf_counter() - t0
+    print(f"  {backend:<8} {elapsed:8.2f}s  ({len(df):,} rows, {df.memory_usage(deep=True).sum() / 2**20:,.0f} MB)")
+    return elapsed
+
+
+if __name__ == "__main__":
+    rows = int(sys.argv[sys.argv.index('--rows') + 1]) if '--rows' in sys.argv else 10_000_000
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "ledger.csv")
+        print(f"Writing {rows:,}-row ledger...")
+        write_ledger(path, rows)
+        print(f"File size: {os.path.getsize(path) / 2**20:,.0f} MB (cores: {os.cpu_count()})")
+        pandas_s = bench(path, 'pandas')
+        if PYARROW_AVAILABLE:
+            arrow_s = bench(path, 'pyarrow')
+            print(f"Speed-up: {pandas_s / arrow_s:.1f}x")
+        else:
+            print("  pyarrow  not installed — skipped")
@@ -0,0 +1,41 @@
+"""Compare FastAPI's default response encoding with FastJSONResponse on an analysis result.
+
+    python bench_json.py               # 200k-row ledger
+    python bench_json.py --rows 1000000
+"""
+import os
+import sys
+import tempfile
+import time
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+
+from bench_csv_parser import write_ledger
+from engine import FraudConfig, FraudEngine
+from ingest import read_csv
+from payload import ORJSON_AVAILABLE, FastJSONResponse
+
+
+def bench(label: str, encode, repeat: int = 5) -> float:
+    best = float('inf')
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        body = encode()
+        best = min(best, time.perf_counter() - t0)
+    print(f"  {label:<28} {best * 1000:8.1f} ms  ({len(body) / 2**20:,.1f} MB)")
+    return best
+
+
+if __name__ == "__main__":
+    rows = int(sys.argv[sys.argv.index('--rows') + 1]) if '--rows' in sys.argv else 200_000
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "ledger.csv")
+        write_ledger(path, rows)
+        FraudConfig.INLINE_NODE_DETAILS = True   # largest payload shape
+        result = FraudEngine(read_csv(path, FraudConfig.CSV_PARSER_BACKEND)).run_analysis()
+
+    print(f"Encoding a {rows:,}-row analysis result (best of 5, orjson: {ORJSON_AVAILABLE}):")
+    default_s = bench("jsonable_encoder + json", lambda: JSONResponse(jsonable_encoder(result)).body)
+    fast_s = bench("FastJSONResponse", lambda: FastJSONResponse(result).body)
+    print(f"Speed-up: {default_s / fast_s:.1f}x")
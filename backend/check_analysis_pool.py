@@ -0,0 +1,83 @@
+"""Check that process-pool analyses match in-process ones, including frames Arrow can't convert
+and uploads parsed in shared memory, and that no shared-memory block outlives its handoff.
+
+    python check_analysis_pool.py
+"""
+import io
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+from analysis_pool import PYARROW_AVAILABLE, AnalysisPool, pack, unpack
+from engine import FraudEngine
+from payload import dumps_json
+
+
+def ledger(rows: int = 2000, seed: int = 7, n_accounts: int = 100) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    accounts = np.array([f"ACC_{i:05d}" for i in range(n_accounts)])
+    return pd.DataFrame({
+        "sender_id": accounts[rng.integers(0, len(accounts), rows)],
+        "receiver_id": accounts[rng.integers(0, len(accounts), rows)],
+        "amount": rng.uniform(10, 10_000, rows).round(2),
+        "timestamp": np.datetime64('2026-01-01T00:00:00') + rng.integers(0, 30 * 86400, rows).astype('timedelta64[s]'),
+        "memo": pd.Series([1, 'x', None] * (rows // 3) + [2.5] * (rows % 3), dtype=object),   # mixed types: no Arrow type fits
+    })
+
+
+def uploads(df: pd.DataFrame) -> dict[str, bytes]:
+    files = {"csv": df.to_csv(index=False).encode()}
+    if PYARROW_AVAILABLE:
+        import pyarrow as pa
+        sink = io.BytesIO()
+        table = pa.Table.from_pandas(df, preserve_index=False)
+        with pa.ipc.new_stream(sink, table.schema) as writer:
+            writer.write_table(table)
+        files["arrow_stream"] = sink.getvalue()
+    return files
+
+
+def shm_blocks() -> set[str]:
+    return {name for name in os.listdir('/dev/shm') if name.startswith('psm_')} if os.path.isdir('/dev/shm') else set()
+
+
+if __name__ == "__main__":
+    df = ledger()
+    failures = []
+    blocks_before = shm_blocks()
+
+    roundtrip = unpack(pack(df))
+    if not roundtrip.equals(df) or list(roundtrip['memo'][:3]) != [1, 'x', None]:
+        failures.append("pack/unpack changed a mixed-type frame")
+
+    expected = FraudEngine(df.copy()).run_analysis()
+    many = ledger(rows=20_000, n_accounts=8000).drop(columns='memo')   # enough account ids to share them
+    pool = AnalysisPool(1)
+    try:
+        result, engine = pool.analyze_frame(df.copy())
+        for fmt, raw in uploads(many).items():
+            local = FraudEngine.from_upload(raw)
+            upload_result, upload_engine = pool.analyze_upload(io.BytesIO(raw))
+            if dumps_json(upload_result) != dumps_json(local.run_analysis()):
+                failures.append(f"process-pool result of a {fmt} upload differs from the in-process one")
+            if upload_engine.accounts.ids is not upload_engine._acc.encoder.ids():
+                failures.append(f"account ids of a {fmt} upload came back as two arrays")
+            more = many.head(50).assign(sender_id="ACC_NEW")
+            if upload_engine.append(more.copy())["analytics"] != local.append(more.copy())["analytics"]:
+                failures.append(f"appending to the engine of a {fmt} upload differs from the in-process one")
+            del upload_engine
+    finally:
+        pool.shutdown()
+    if dumps_json(result) != dumps_json(expected):
+        failures.append("process-pool result differs from the in-process one")
+    if list(engine.df['memo'][:3]) != [1, 'x', None]:
+        failures.append("engine came back with altered metadata")
+    if shm_blocks() - blocks_before:
+        failures.append(f"shared-memory blocks left behind: {sorted(shm_blocks() - blocks_before)}")
+
+    for failure in failures:
+        print(f"  FAIL {failure}")
+    print("OK" if not failures else f"{len(failures)} check(s) failed")
+    sys.exit(1 if failures else 0)
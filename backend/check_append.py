@@ -0,0 +1,148 @@
+"""Check that FraudEngine.append() scores like a fresh full analysis of the concatenated ledger.
+
+    python check_append.py                # 16 random ledgers
+    python check_append.py --ledgers 50
+
+Each ledger (with planted smurfing hubs, velocity bursts, round trips and
+cycles) is analysed on its first 60-80% and the rest appended in 1-3
+slices, with time-respecting and structural cycles, detectors run serially
+and concurrently. A scan from timezone-aware Parquet must also take naive
+CSV appends, and an append that fails must leave the scan as it was.
+Exits non-zero on any difference.
+"""
+import sys
+
+import numpy as np
+import pandas as pd
+
+import engine
+from engine import FraudConfig, FraudEngine
+from ingest import PYARROW_AVAILABLE, read_upload
+
+
+def ledger(seed: int, rows: int = 600) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    accounts = np.array([f"ACC_{i:04d}" for i in range(rng.integers(60, 150))])
+    start = np.datetime64('2026-01-01T00:00:00')
+    # Background flows mostly run to higher-numbered accounts, so structural
+    # cycles stay few enough to enumerate without truncation
+    a, b = rng.integers(0, len(accounts), rows), rng.integers(0, len(accounts), rows)
+    forward = rng.random(rows) < 0.97
+    frames = [pd.DataFrame({
+        "sender_id": accounts[np.where(forward, np.minimum(a, b), a)],
+        "receiver_id": accounts[np.where(forward, np.maximum(a, b), b)],
+        "amount": rng.uniform(10, 20_000, rows).round(2),
+        "timestamp": start + rng.integers(0, 20 * 86400, rows).astype('timedelta64[s]'),
+    })]
+
+    def planted(senders, receivers, amounts, times):
+        frames.append(pd.DataFrame({"sender_id": senders, "receiver_id": receivers, "amount": amounts,
+                                    "timestamp": start + np.asarray(times).astype('timedelta64[s]')}))
+
+    for _ in range(rng.integers(1, 4)):   # structured fan-out / fan-in hubs
+        hub, members = rng.choice(accounts), rng.choice(accounts, rng.integers(10, 16), replace=False)
+        amounts = np.full(len(members), rng.uniform(2000, 9000)) * rng.uniform(0.97, 1.03, len(members))
+        times = rng.integers(0, 20 * 86400, len(members))
+        if rng.random() < 0.5:
+            planted([hub] * len(members), members, amounts.round(2), times)
+        else:
+            planted(members, [hub] * len(members), amounts.round(2), times)
+    for _ in range(rng.integers(1, 3)):   # velocity bursts
+        sender, t0 = rng.choice(accounts), rng.integers(0, 19 * 86400)
+        n = rng.integers(8, 14)
+        planted([sender] * n, rng.choice(accounts, n), rng.uniform(10, 500, n).round(2), t0 + np.sort(rng.integers(0, 3000, n)))
+    for _ in range(rng.integers(1, 4)):   # round trips
+        a, b = rng.choice(accounts, 2, replace=False)
+        amount, t0 = rng.uniform(1000, 9000), rng.integers(0, 19 * 86400)
+        planted([a, b], [b, a], [round(amount, 2), round(amount * rng.uniform(0.96, 1.0), 2)], [t0, t0 + rng.integers(60, 86400)])
+    for _ in range(rng.integers(1, 4)):   # cycles with legs in time order
+        ring = rng.choice(accounts, rng.integers(3, 6), replace=False)
+        t0 = rng.integers(0, 19 * 86400)
+        amounts = rng.uniform(1000, 9000) * np.cumprod(rng.uniform(0.97, 0.995, len(ring)))   # each hop skims a little
+        planted(ring, np.roll(ring, -1), amounts.round(2), t0 + np.arange(len(ring)) * 3600)
+
+    df = pd.concat(frames, ignore_index=True)
+    return df.iloc[rng.permutation(len(df))].reset_index(drop=True)
+
+
+def state(engine: FraudEngine) -> dict:
+    """Per-account scores/labels and the ring set, keyed by account id so code order doesn't matter."""
+    accounts = engine.accounts
+    ids = accounts.ids.astype(str)
+    order = np.argsort(ids)
+    rings = sorted((r['pattern_type'], r['score'], tuple(sorted(map(str, accounts.ids[r['nodes']]))))
+                   for r in engine.fraud_rings)
+    return {"ids": ids[order], "scores": accounts.scores[order], "labels": accounts.labels[order],
+            "fraud_count": accounts.fraud_count[order], "sent": accounts.sent[order].round(4),
+            "received": accounts.received[order].round(4), "rings": rings}
+
+
+def compare(df: pd.DataFrame, cuts: list[int]) -> list[str] | None:
+    """Names of the state fields that differ; None when a cycle search was truncated (timing-dependent)."""
+    full = FraudEngine(df.copy())
+    full.run_analysis()
+    engine = FraudEngine(df.iloc[:cuts[0]].copy())
+    engine.run_analysis()
+    for lo, hi in zip(cuts, cuts[1:] + [len(df)]):
+        engine.append(df.iloc[lo:hi].copy())
+    if full.cycle_search["truncated"] or engine.cycle_search["truncated"]:
+        return None
+    expected, got = state(full), state(engine)
+    return [key for key in expected
+            if not (np.array_equal(expected[key], got[key]) if key != "rings" else expected[key] == got[key])]
+
+
+def failed_append_checks() -> list[str]:
+    df = ledger(0)
+    failures = []
+    if PYARROW_AVAILABLE:
+        aware = df.assign(timestamp=df['timestamp'].dt.tz_localize('UTC'))
+        scan = FraudEngine(read_upload(aware.iloc[:500].to_parquet()))
+        scan.run_analysis()
+        try:
+            scan.append(read_upload(df.iloc[500:].to_csv(index=False).encode()))
+        except Exception as e:
+            failures.append(f"naive CSV append to a timezone-aware scan failed: {e!r}")
+
+    scan = FraudEngine(df.iloc[:500].copy())
+    scan.run_analysis()
+    before = state(scan)
+    run = engine.DETECTORS['round_trips']['run']
+    engine.DETECTORS['round_trips']['run'] = lambda *args, **kwargs: 1 / 0
+    try:
+        scan.append(df.iloc[500:].copy())
+    except ZeroDivisionError:
+        pass
+    finally:
+        engine.DETECTORS['round_trips']['run'] = run
+    if len(scan.df) != 500 or any(not np.array_equal(v, state(scan)[k]) if k != "rings" else v != state(scan)[k]
+                                  for k, v in before.items()):
+        failures.append("a failed append changed the scan")
+    return failures
+
+
+if __name__ == "__main__":
+    ledgers = int(sys.argv[sys.argv.index('--ledgers') + 1]) if '--ledgers' in sys.argv else 16
+    failures = skipped = 0
+    for temporal in (True, False):
+        for workers in (1, max(FraudConfig.DETECTOR_WORKERS, 2)):
+            FraudConfig.CYCLE_TIME_RESPECTING, FraudConfig.DETECTOR_WORKERS = temporal, workers
+            for seed in range(ledgers):
+                df = ledger(seed)
+                rng = np.random.default_rng(seed + 1000)
+                first = int(len(df) * rng.uniform(0.6, 0.8))
+                cuts = [first] + sorted(rng.choice(np.arange(first + 1, len(df)), rng.integers(0, 3), replace=False).tolist())
+                diff = compare(df, cuts)
+                if diff is None:
+                    skipped += 1
+                elif diff:
+                    failures += 1
+                    print(f"  FAIL temporal={temporal} workers={workers} seed={seed} cuts={cuts}: {', '.join(diff)}")
+            print(f"temporal={temporal} workers={workers}: {ledgers} ledgers checked")
+    for failure in failed_append_checks():
+        failures += 1
+        print(f"  FAIL {failure}")
+    if skipped:
+        print(f"{skipped} run(s) skipped: cycle search truncated")
+    print("OK" if not failures else f"{failures} mismatch(es)")
+    sys.exit(1 if failures else 0)
@@ -0,0 +1,95 @@
+"""Check that the analysis cache evicts old scans, that evicted scans answer 404 without a scan store,
+and that with one they are loaded back, appends included, and never replaced by a re-upload.
+
+    python check_cache.py
+"""
+import sys
+import tempfile
+
+import numpy as np
+import pandas as pd
+from fastapi.testclient import TestClient
+
+import main
+from scan_store import ScanStore
+
+
+def upload(client: TestClient, df: pd.DataFrame) -> dict:
+    return client.post('/api/analyze', files={'file': ('ledger.csv', df.to_csv(index=False).encode())}).json()
+
+
+if __name__ == "__main__":
+    rng = np.random.default_rng(3)
+    accounts = np.array([f"ACC_{i:03d}" for i in range(40)])
+    df = pd.DataFrame({
+        "sender_id": accounts[rng.integers(0, len(accounts), 300)],
+        "receiver_id": accounts[rng.integers(0, len(accounts), 300)],
+        "amount": rng.uniform(10, 10_000, 300).round(2),
+        "timestamp": np.datetime64('2026-01-01T00:00:00') + rng.integers(0, 30 * 86400, 300).astype('timedelta64[s]'),
+    })
+    client = TestClient(main.app)
+    main.CACHE_MAX_ENGINES = 2
+    main.scan_store = None
+    failures = []
+
+    ledgers = []
+    for i in range(4):   # distinct files, so distinct scans
+        ledgers.append(df.copy())
+        ledgers[-1].loc[0, 'amount'] = 1000 + i
+    scans = [upload(client, ledger)["scan_id"] for ledger in ledgers]
+    account = df['sender_id'][0]
+
+    status = [client.get(f'/api/scan/{scan}/node/{account}').status_code for scan in scans]
+    if status != [404, 404, 200, 200]:
+        failures.append(f"node details of the 4 scans answered {status}, expected the 2 oldest to 404")
+    if client.post(f'/api/scan/{scans[0]}/nodes', json={"account_ids": [account]}).status_code != 404:
+        failures.append("batch node details of an evicted scan didn't 404")
+    if client.post(f'/api/scan/{scans[0]}/append', files={'file': ('more.csv', b'x')}).status_code != 404:
+        failures.append("appending to an evicted scan didn't 404")
+
+    again = upload(client, ledgers[0])
+    if again["cached"] or client.get(f'/api/scan/{scans[0]}/node/{account}').status_code != 200:
+        failures.append("re-uploading an evicted scan didn't re-analyse it")
+
+    for entry in main._result_cache.values():
+        entry["ts"] -= main.CACHE_TTL + 1
+    upload(client, ledgers[1])
+    if set(main._result_cache) != {scans[1]}:
+        failures.append(f"expired scans stayed cached: {sorted(main._result_cache)}")
+    if client.get(f'/api/scan/{scans[3]}/node/{account}').status_code != 404:
+        failures.append("node details of an expired scan didn't 404")
+
+    # ── With a scan store: evicted and expired scans come back from disk ─
+    main._result_cache.clear()
+    main.scan_store = ScanStore(tempfile.mkdtemp(), retention_s=3600)
+    scans = [upload(client, ledger)["scan_id"] for ledger in ledgers]
+    main._store_executor.submit(lambda: None).result()   # wait for the background saves
+    status = [client.get(f'/api/scan/{scan}/node/{account}').status_code for scan in scans]
+    if status != [200] * 4:
+        failures.append(f"node details of stored scans answered {status}, expected all 200")
+
+    new_rows = df.head(5).assign(amount=77_777.0, sender_id="ACC_NEW")
+    for entry in main._result_cache.values():
+        entry["ts"] -= main.CACHE_TTL + 1
+    appended = client.post(f'/api/scan/{scans[0]}/append',
+                           files={'file': ('more.csv', new_rows.to_csv(index=False).encode())})
+    if appended.status_code != 200 or appended.json()["rows_appended"] != 5:
+        failures.append(f"appending to an expired stored scan answered {appended.status_code}")
+
+    again = upload(client, ledgers[0])
+    if again["scan_id"] == scans[0] or again["cached"]:
+        failures.append("re-uploading the base file of an appended scan reused its scan_id")
+    main._store_executor.submit(lambda: None).result()
+    main._result_cache.clear()   # as after a restart
+    node = client.get(f'/api/scan/{scans[0]}/node/ACC_NEW')
+    if node.status_code != 200:
+        failures.append(f"the appended rows of a scan didn't survive a restart ({node.status_code})")
+    if client.get(f'/api/scan/{again["scan_id"]}/node/ACC_NEW').status_code != 404:
+        failures.append("the re-uploaded base file picked up another scan's appended rows")
+    if not upload(client, ledgers[1])["cached"]:
+        failures.append("a stored, never appended scan wasn't reused on re-upload")
+
+    for failure in failures:
+        print(f"  FAIL {failure}")
+    print("OK" if not failures else f"{len(failures)} check(s) failed")
+    sys.exit(1 if failures else 0)
@@ -0,0 +1,462 @@
+import multiprocessing
+import threading
+import time
+from bisect import bisect_left, bisect_right
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+
+import networkx as nx
+import numpy as np
+import pandas as pd
+
+TRIM_MAX_ROUNDS = 64     # vectorized peeling rounds before handing the rest to SCC
+
+_pool: ProcessPoolExecutor | None = None
+_pool_workers = 0
+_pool_lock = threading.Lock()
+
+
+class CSRGraph:
+    """Directed graph over int32 account codes in compressed sparse row form.
+
+    Edge weights are pair transfer counts; self-loops are dropped since they
+    can never be part of a cycle of length >= 2.
+    """
+
+    def __init__(self, n_nodes: int, src: np.ndarray, dst: np.ndarray, weight: np.ndarray):
+        keep = src != dst
+        src, dst, weight = src[keep], dst[keep], weight[keep]
+        order = np.lexsort((dst, src))
+        self.n_nodes = n_nodes
+        self.indptr = np.concatenate([[0], np.cumsum(np.bincount(src, minlength=n_nodes))]).astype(np.int64)
+        self.indices = dst[order].astype(np.int32)
+        self.weight = weight[order].astype(np.int64)
+
+    @classmethod
+    def from_pairs(cls, pairs: pd.DataFrame, n_nodes: int) -> 'CSRGraph':
+        return cls(n_nodes, pairs['sender_code'].to_numpy(np.int64), pairs['receiver_code'].to_numpy(np.int64),
+                   pairs['count'].to_numpy(np.int64))
+
+    @property
+    def src(self) -> np.ndarray:
+        return np.repeat(np.arange(self.n_nodes, dtype=np.int32), np.diff(self.indptr))
+
+    def with_edges(self, n_nodes: int, src: np.ndarray, dst: np.ndarray, weight: np.ndarray) -> 'CSRGraph':
+        """A copy over n_nodes (>= self.n_nodes) with src[i] -> dst[i] weighted weight[i], inserted where missing.
+
+        Costs the given edges plus one copy of the arrays; nothing is re-sorted.
+        """
+        keep = src != dst
+        src, dst, weight = src[keep].astype(np.int64), dst[keep].astype(np.int64), weight[keep].astype(np.int64)
+        order = np.lexsort((dst, src))
+        src, dst, weight = src[order], dst[order], weight[order]
+        edge_key = self.src.astype(np.int64) << 32 | self.indices.astype(np.int64)
+        key = src << 32 | dst
+        pos = np.searchsorted(edge_key, key)
+        seen = pos < len(edge_key)
+        seen[seen] = edge_key[pos[seen]] == key[seen]
+
+        graph = CSRGraph.__new__(CSRGraph)
+        graph.n_nodes = n_nodes
+        counts = np.bincount(src[~seen], minlength=n_nodes)
+        counts[:self.n_nodes] += np.diff(self.indptr)
+        graph.indptr = np.concatenate([[0], np.cumsum(counts)]).astype(np.int64)
+        old_weight = self.weight.copy()
+        old_weight[pos[seen]] = weight[seen]
+        graph.indices = np.insert(self.indices, pos[~seen], dst[~seen].astype(np.int32))
+        graph.weight = np.insert(old_weight, pos[~seen], weight[~seen])
+        return graph
+
+    def reversed(self) -> 'CSRGraph':
+        return CSRGraph(self.n_nodes, self.indices.astype(np.int64), self.src.astype(np.int64), self.weight)
+
+
+class TemporalEdgeIndex:
+    """Individual transfers (legs) behind each CSRGraph edge, sorted by time.
+
+    Edge e owns legs ptr[e]:ptr[e + 1]. window_s caps the time between the
+    first and last leg of a loop; max_drop is the largest fraction of the
+    amount each hop may skim off (it may never grow).
+    """
+
+    def __init__(self, ptr: np.ndarray, ts: np.ndarray, amount: np.ndarray,
+                 window_s: float | None = None, max_drop: float = 0.0):
+        self.ptr = ptr
+        self.ts = ts
+        self.amount = amount
+        self.window_s = window_s
+        self.max_drop = max_drop
+
+    @classmethod
+    def build(cls, graph: CSRGraph, src: np.ndarray, dst: np.ndarray, ts: np.ndarray, amount: np.ndarray,
+              window_s: float | None = None, max_drop: float = 0.0) -> 'TemporalEdgeIndex':
+        keep = src != dst
+        key = src[keep].astype(np.int64) << 32 | dst[keep].astype(np.int64)
+        ts, amount = ts[keep], amount[keep]
+        order = np.lexsort((ts, key))
+        edge_key = graph.src.astype(np.int64) << 32 | graph.indices.astype(np.int64)
+        ptr = np.append(np.searchsorted(key[order], edge_key), len(key)).astype(np.int64)
+        return cls(ptr, ts[order].astype(np.int64), amount[order].astype(np.float64), window_s, max_drop)
+
+    def subset(self, edge_ids: np.ndarray) -> 'TemporalEdgeIndex':
+        """Index restricted to edge_ids, renumbered 0..len(edge_ids) - 1."""
+        lo, hi = self.ptr[edge_ids], self.ptr[edge_ids + 1]
+        ptr = np.concatenate([[0], np.cumsum(hi - lo)]).astype(np.int64)
+        legs = np.repeat(lo - ptr[:-1], hi - lo) + np.arange(ptr[-1])
+        return TemporalEdgeIndex(ptr, self.ts[legs], self.amount[legs], self.window_s, self.max_drop)
+
+
+class CycleEnumerator:
+    """Lazily yields (cycle, loop_completions) for simple cycles up to max_length.
+
+    Each cycle is rooted at its smallest node, so it is produced exactly once.
+    A reverse BFS from every root bounds how far the DFS may wander before it
+    can no longer close the loop in time. Enumeration stops once max_cycles
+    have been yielded or time_budget_s has elapsed; `truncated` and `reason`
+    record why.
+
+    With a TemporalEdgeIndex the walk also tracks which legs could carry the
+    money so far, and only extends along legs that keep the loop
+    time-respecting (see _extend); loop_completions then counts the distinct
+    legs out of the root that close such a loop.
+
+    With `through` (edge positions) only cycles using one of those edges are
+    walked, starting from each edge in turn; every cycle is still reported
+    once, rotated to its smallest node with completions counted from there.
+    """
+
+    CLOCK_CHECK_EVERY = 4096
+
+    def __init__(self, graph: CSRGraph, max_length: int, min_length: int = 3,
+                 max_cycles: int | None = None, time_budget_s: float | None = None,
+                 temporal: TemporalEdgeIndex | None = None, through: np.ndarray | None = None):
+        self.graph = graph
+        self.temporal = temporal
+        self.through = through
+        self.max_length = max_length
+        self.min_length = min_length
+        self.max_cycles = max_cycles
+        self.time_budget_s = time_budget_s
+        self.truncated = False
+        self.reason: str | None = None
+        self.found = 0
+
+    def __iter__(self):
+        g = self.graph
+        indptr, indices, weight = g.indptr.tolist(), g.indices.tolist(), g.weight.tolist()
+        rev = g.reversed()
+        rev_indptr, rev_indices = rev.indptr.tolist(), rev.indices.tolist()
+        deadline = time.monotonic() + self.time_budget_s if self.time_budget_s is not None else None
+        max_len, min_len = self.max_length, self.min_length
+        steps = 0
+        # What the walk carries along the path: the bottleneck pair count, or
+        # the live leg states when a temporal index is attached
+        if self.temporal is None:
+            extend = close = lambda carried, p: weight[p] if carried is None else min(carried, weight[p])
+        else:
+            extend, close = self._temporal_steps()
+
+        if self.through is None:
+            # Only nodes with both in- and out-edges can sit on a cycle
+            candidates = np.flatnonzero((np.diff(g.indptr) > 0) & (np.diff(rev.indptr) > 0)).tolist()
+            roots = [(start, None) for start in candidates]
+        else:
+            roots = list(zip(g.src[self.through].tolist(), self.through.tolist()))
+            seen = set()
+
+        for start, first in roots:
+            if first is None or self.temporal is None:
+                back = self._distances_to(start, rev_indptr, rev_indices, max_len - 1, start if first is None else -1)
+                if len(back) < min_len:
+                    continue
+            else:
+                # Edge roots can't use the > start cut, so the reverse BFS would cover the
+                # whole max_len - 1 ball; the time-respecting legs prune far harder.
+                back = None
+
+            path, on_path = [start], {start}
+            carry = [None]
+            ptrs, ends = [indptr[start]], [indptr[start + 1]]
+            if first is not None:
+                w = indices[first]
+                carried = extend(None, first)
+                if not carried or (back is not None and w not in back):
+                    continue
+                path.append(w)
+                on_path.add(w)
+                carry.append(carried)
+                ptrs, ends = [first + 1, indptr[w]], [first + 1, indptr[w + 1]]
+            while path:
+                steps += 1
+                if deadline is not None and steps % self.CLOCK_CHECK_EVERY == 0 and time.monotonic() > deadline:
+                    self.truncated, self.reason = True, 'time_budget'
+                    return
+                p = ptrs[-1]
+                if p == ends[-1]:
+                    on_path.discard(path.pop())
+                    carry.pop(); ptrs.pop(); ends.pop()
+                    continue
+                ptrs[-1] = p + 1
+                w = indices[p]
+                depth = len(path)
+                if w == start:
+                    if depth >= min_len:
+                        completions = close(carry[-1], p)
+                        if not completions:
+                            continue
+                        cycle = tuple(path)
+                        if first is not None:
+                            cycle, completions = self._rooted(cycle, [q - 1 for q in ptrs[:-1]] + [p], extend, close)
+                            if cycle in seen:
+                                continue
+                            seen.add(cycle)
+                        yield cycle, completions
+                        self.found += 1
+                        if self.max_cycles is not None and self.found >= self.max_cycles:
+                            self.truncated, self.reason = True, 'max_cycles'
+                            return
+                    continue
+                d = back.get(w) if back is not None else 1
+                if d is None or w in on_path or depth + d > max_len:
+                    continue
+                carried = extend(carry[-1], p)
+                if not carried:
+                    continue
+                path.append(w)
+                on_path.add(w)
+                carry.append(carried)
+                ptrs.append(indptr[w])
+                ends.append(indptr[w + 1])
+
+    def _temporal_steps(self):
+        """(extend, close) callbacks that walk leg states along a path.
+
+        A state is (first_t, first_amt, last_t, last_amt, wrapped). Read in time
+        order a loop may start at any hop, so going round from the root the
+        times rise, may drop once (the "wrap" onto the earliest leg), then rise
+        again while staying before the root's first leg. Every hop that is
+        consecutive in time must shrink the amount by at most max_drop; across
+        the wrap that hop is last leg -> root's first leg, checked on closing.
+        """
+        idx = self.temporal
+        ptr, ts, amt = idx.ptr.tolist(), idx.ts.tolist(), idx.amount.tolist()
+        window = float('inf') if idx.window_s is None else idx.window_s
+        keep = 1.0 - idx.max_drop
+
+        def extend(states, p):
+            lo, hi = ptr[p], ptr[p + 1]
+            if states is None:
+                return list({(t, a, t, a, False) for t, a in zip(ts[lo:hi], amt[lo:hi])})
+            out = set()
+            for first_t, first_a, last_t, last_a, wrapped in states:
+                end = bisect_left(ts, first_t, lo, hi) if wrapped else bisect_right(ts, first_t + window, lo, hi)
+                for k in range(bisect_right(ts, last_t, lo, hi), end):
+                    if last_a * keep <= amt[k] <= last_a:
+                        out.add((first_t, first_a, ts[k], amt[k], wrapped))
+                if not wrapped:
+                    for k in range(bisect_left(ts, last_t - window, lo, hi), bisect_left(ts, first_t, lo, hi)):
+                        out.add((first_t, first_a, ts[k], amt[k], True))
+            return list(out)
+
+        def close(states, p):
+            return len({(first_t, first_a) for first_t, first_a, _, last_a, wrapped in extend(states, p)
+                        if not wrapped or last_a * keep <= first_a <= last_a})
+
+        return extend, close
+
+    @staticmethod
+    def _rooted(cycle: tuple, edges: list, extend, close) -> tuple:
+        """Cycle rotated to start at its smallest node, with completions recounted from that root."""
+        i = cycle.index(min(cycle))
+        edges = edges[i:] + edges[:i]
+        carried = None
+        for p in edges[:-1]:
+            carried = extend(carried, p)
+        return cycle[i:] + cycle[:i], close(carried, edges[-1])
+
+    @staticmethod
+    def _distances_to(start: int, rev_indptr: list, rev_indices: list, max_hops: int, floor: int | None = None) -> dict:
+        """Hops from each node (> floor, default start) back to start, up to max_hops."""
+        floor = start if floor is None else floor
+        dist = {start: 0}
+        queue = deque([start])
+        while queue:
+            v = queue.popleft()
+            d = dist[v] + 1
+            if d > max_hops:
+                continue
+            for u in rev_indices[rev_indptr[v]:rev_indptr[v + 1]]:
+                if u > floor and u not in dist:
+                    dist[u] = d
+                    queue.append(u)
+        return dist
+
+
+# ── SCC-partitioned search ──────────────────────────────────────────────
+def trim(graph: CSRGraph) -> np.ndarray:
+    """Mask of nodes left after repeatedly dropping nodes with no live in- or out-edges."""
+    src, dst = graph.src, graph.indices
+    alive = np.ones(graph.n_nodes, dtype=bool)
+    for _ in range(TRIM_MAX_ROUNDS):
+        live = alive[src] & alive[dst]
+        keep = alive & (np.bincount(src[live], minlength=graph.n_nodes) > 0) & (np.bincount(dst[live], minlength=graph.n_nodes) > 0)
+        if np.array_equal(keep, alive):
+            break
+        alive = keep
+    return alive
+
+
+def cycle_components(graph: CSRGraph, min_size: int) -> list[np.ndarray]:
+    """Sorted node arrays of the nontrivial SCCs, ordered by their smallest node."""
+    alive = trim(graph)
+    src, dst = graph.src, graph.indices
+    live = alive[src] & alive[dst]
+    core = nx.DiGraph()
+    core.add_edges_from(zip(src[live].tolist(), dst[live].tolist()))
+    comps = [np.sort(np.fromiter(c, dtype=np.int32, count=len(c)))
+             for c in nx.strongly_connected_components(core) if len(c) >= min_size]
+    comps.sort(key=lambda c: c[0])
+    return comps
+
+
+def reach_within(graph: CSRGraph, sources: np.ndarray, max_hops: int) -> np.ndarray:
+    """Hops from the nearest source to every node (-1 beyond max_hops), one vectorized frontier per hop."""
+    dist = np.full(graph.n_nodes, -1, dtype=np.int64)
+    frontier = np.unique(np.asarray(sources, dtype=np.int64))
+    dist[frontier] = 0
+    for hop in range(1, max_hops + 1):
+        lo, hi = graph.indptr[frontier], graph.indptr[frontier + 1]
+        counts = hi - lo
+        offsets = np.concatenate([[0], np.cumsum(counts)])
+        nbrs = graph.indices[np.repeat(lo - offsets[:-1], counts) + np.arange(offsets[-1])]
+        frontier = np.unique(nbrs[dist[nbrs] < 0])
+        if not len(frontier):
+            break
+        dist[frontier] = hop
+    return dist
+
+
+def cycle_ball(graph: CSRGraph, src: np.ndarray, dst: np.ndarray, max_length: int,
+               reverse: CSRGraph | None = None) -> np.ndarray:
+    """Mask of nodes that can sit on a cycle of <= max_length edges through some edge src[i] -> dst[i].
+
+    Such a cycle closes with a path dst ~> src of at most max_length - 1 hops,
+    so every node x on it has d(dst, x) + d(x, src) <= max_length - 1.
+    `reverse` is graph.reversed(), when the caller keeps one.
+    """
+    ahead = reach_within(graph, dst, max_length - 1)
+    behind = reach_within(graph.reversed() if reverse is None else reverse, src, max_length - 1)
+    return (ahead >= 0) & (behind >= 0) & (ahead + behind <= max_length - 1)
+
+
+def _component_graphs(graph: CSRGraph, comps: list[np.ndarray]) -> list[tuple]:
+    """(CSRGraph constructor args, global edge ids) per component, with edges split in one pass."""
+    src, dst = graph.src, graph.indices
+    comp_of = np.full(graph.n_nodes, -1, dtype=np.int64)
+    for k, nodes in enumerate(comps):
+        comp_of[nodes] = k
+    edge_comp = comp_of[src]
+    inside = (edge_comp >= 0) & (edge_comp == comp_of[dst])
+    order = np.argsort(edge_comp[inside], kind='stable')
+    edge_ids = np.flatnonzero(inside)[order]
+    edge_comp = edge_comp[inside][order]
+    src, dst, weight = src[inside][order], dst[inside][order], graph.weight[inside][order]
+    bounds = np.searchsorted(edge_comp, np.arange(len(comps) + 1))
+    # nodes are sorted, so local ids keep the global order (cycles stay rooted at
+    # their min node) and local edge i is still global edge edge_ids[lo + i]
+    return [((len(nodes), np.searchsorted(nodes, src[lo:hi]), np.searchsorted(nodes, dst[lo:hi]), weight[lo:hi]),
+             edge_ids[lo:hi])
+            for nodes, lo, hi in zip(comps, bounds[:-1], bounds[1:])]
+
+
+def _enumerate_component(nodes: np.ndarray, local: tuple, max_length: int, min_length: int,
+                         max_cycles: int | None, deadline: float | None,
+                         temporal: TemporalEdgeIndex | None = None) -> tuple:
+    """Worker entry point: cycles of one component, mapped back to global codes."""
+    budget = None if deadline is None else max(deadline - time.time(), 0.0)
+    cycles = CycleEnumerator(CSRGraph(*local), max_length, min_length, max_cycles, budget, temporal)
+    found = [(tuple(nodes[list(c)].tolist()), completions) for c, completions in cycles]
+    return found, cycles.truncated, cycles.reason
+
+
+def _submit(workers: int, calls: list[tuple]) -> list[Future]:
+    """Submit (fn, *args) calls to the shared process pool, rebuilt when the worker count changes.
+
+    Lookup and submit happen under one lock hold, so a concurrent resize can't
+    shut the pool down in between; work already submitted to a retired pool
+    still runs to completion.
+    """
+    global _pool, _pool_workers
+    with _pool_lock:
+        if _pool is None or _pool_workers != workers:
+            if _pool is not None:
+                _pool.shutdown(wait=False)
+            # spawn, not fork: the engine runs on web-server threads
+            _pool = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn'))
+            _pool_workers = workers
+        return [_pool.submit(*call) for call in calls]
+
+
+def search_cycles(graph: CSRGraph, max_length: int, min_length: int = 3, max_cycles: int | None = None,
+                  time_budget_s: float | None = None, workers: int = 1, parallel_min_edges: int = 0,
+                  temporal: TemporalEdgeIndex | None = None) -> dict:
+    """Enumerate cycles component by component and merge them deterministically.
+
+    Nodes outside every nontrivial strongly connected component can't be on
+    a cycle and are never searched. Components with at least
+    parallel_min_edges edges go to a process pool when workers > 1; the rest
+    run inline. Results are merged in component order (by smallest node)
+    whatever order the workers finish in, up to max_cycles in total: inline
+    components only get the budget left, and collection stops (cancelling
+    queued components) once it is spent. A temporal index is split along
+    with the graph so each component only ships its own legs.
+    """
+    deadline = None if time_budget_s is None else time.time() + time_budget_s
+    comps = cycle_components(graph, min_length)
+    jobs = [(nodes, local, None if temporal is None else temporal.subset(edge_ids),
+             workers > 1 and len(local[1]) >= parallel_min_edges)
+            for nodes, (local, edge_ids) in zip(comps, _component_graphs(graph, comps))]
+
+    remote = [(_enumerate_component, nodes, local, max_length, min_length, max_cycles, deadline, legs)
+              for nodes, local, legs, is_remote in jobs if is_remote]
+    futures = iter(_submit(workers, remote) if remote else [])
+    pending = [next(futures) if is_remote else None for *_, is_remote in jobs]
+
+    cycles, truncated, reason = [], False, None
+    for i, ((nodes, local, legs, _), future) in enumerate(zip(jobs, pending)):
+        left = None if max_cycles is None else max_cycles - len(cycles)
+        if left == 0:
+            for future in pending[i:]:
+                if future is not None:
+                    future.cancel()
+            truncated, reason = True, reason or 'max_cycles'
+            break
+        found, cut, why = future.result() if future is not None else \
+            _enumerate_component(nodes, local, max_length, min_length, left, deadline, legs)
+        if left is not None and len(found) > left:   # remote components run with the full budget
+            found, cut, why = found[:left], True, 'max_cycles'
+        cycles.extend(found)
+        if cut and not truncated:
+            truncated, reason = True, why
+    return {"cycles": cycles, "components": len(jobs), "truncated": truncated, "reason": reason}
+
+
+def search_cycles_through(graph: CSRGraph, src: np.ndarray, dst: np.ndarray, max_length: int, min_length: int = 3,
+                          max_cycles: int | None = None, time_budget_s: float | None = None,
+                          temporal: TemporalEdgeIndex | None = None) -> dict:
+    """Cycles using at least one src[i] -> dst[i] edge, shaped like search_cycles' result.
+
+    Runs in-process and walks out from those edges only, so the cost follows
+    their neighbourhood rather than the whole graph. Pairs missing from the
+    graph (and self-loops) are ignored.
+    """
+    edge_key = graph.src.astype(np.int64) << 32 | graph.indices.astype(np.int64)
+    wanted = np.unique(np.asarray(src, dtype=np.int64) << 32 | np.asarray(dst, dtype=np.int64))
+    pos = np.searchsorted(edge_key, wanted)
+    if len(edge_key):
+        pos = pos[(pos < len(edge_key)) & (edge_key[np.minimum(pos, len(edge_key) - 1)] == wanted)]
+    else:
+        pos = pos[:0]   # no edges at all (e.g. none pass the time-respecting filters)
+    cycles = CycleEnumerator(graph, max_length, min_length, max_cycles, time_budget_s, temporal, through=pos)
+    found = list(cycles)
+    return {"cycles": found, "components": None, "truncated": cycles.truncated, "reason": cycles.reason}
@@ -1,11 +1,24 @@
+import hashlib
+import heapq
+import io
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
 import pandas as pd
 import networkx as nx
 import numpy as np
-import hashlib
-import re
+
+from account_table import LABEL_BITS, AccountTable, hash_countries
+from cycles import CSRGraph, TemporalEdgeIndex, cycle_ball, search_cycles, search_cycles_through
+from ingest import (CORE_COLUMNS, EdgeAccumulator, infer_schema, iter_csv_chunks, normalize_headers,
+                    parse_amount, parse_timestamp, read_upload, sniff_format, to_epoch_seconds)
+from metrics import Timings
+from node_store import NodeStore
 
 class FraudConfig:
     HIGH_RISK_COUNTRIES = ['KY', 'PA', 'VG', 'CY', 'BS']
+    STANDARD_COUNTRIES = ['IN', 'US', 'GB', 'AE', 'SG']
     GEO_RISK_POINTS = 15
     SMURF_MAX_AMOUNT = 10000
     SMURF_MIN_UNIQUE_ACCOUNTS = 10
@@ -13,327 +26,839 @@ class FraudConfig:
     SMURF_POINTS = 20
     CYCLE_MAX_LENGTH = 6
     CYCLE_BASE_POINTS = 10
+    CYCLE_MAX_COUNT = 50_000          # stop enumerating after this many cycles
+    CYCLE_TIME_BUDGET_S = 10.0        # wall-clock budget for cycle enumeration
+    CYCLE_WORKERS = min(4, os.cpu_count() or 1)   # processes for SCC-parallel cycle search
+    CYCLE_PARALLEL_MIN_EDGES = 20_000 # smaller components are searched in-process
+    CYCLE_TIME_RESPECTING = True      # legs must follow each other in time (see CYCLE_WINDOW_HOURS)
+    CYCLE_WINDOW_HOURS = 72           # max time from first to last leg of a loop (None = unbounded)
     LAYER_MIN_DEPTH = 3
-    LAYER_CUT_PERCENTAGE = 0.05
+    LAYER_CUT_PERCENTAGE = 0.05       # max share of the amount each hop may skim off
     LAYER_POINTS = 15
     FREEZE_THRESHOLD_SCORE = 40
     MAX_NODES_TO_RENDER = 800
+    RENDER_NEIGHBOR_CAP = 50          # counterparties each flagged account may pull into the view
+    INLINE_NODE_DETAILS = False       # embed history/metadata per node (else served by the node-detail API)
+    TIMELINE_GRANULARITY = 'daily'    # 'hourly' | 'daily' | 'weekly' (weeks start on Monday)
+    # SHADOW_BOSS centrality on the render subgraph
+    CENTRALITY_MODE = 'sampled'       # 'exact' | 'sampled' (k pivots) | 'degree' (in x out degree proxy)
+    CENTRALITY_SAMPLE_K = 128         # pivots for 'sampled'; subgraphs this small are computed exactly
+    CENTRALITY_SEED = 42
+    # Detector registry (see register_detector)
+    DETECTOR_WORKERS = min(5, os.cpu_count() or 1)   # threads running detectors side by side (1 = one after another)
+    # Ingestion
+    CSV_PARSER_BACKEND = 'auto'       # 'auto' | 'pyarrow' | 'pandas'
+    STREAM_MEMORY_BUDGET_MB = 512     # working memory for one CSV chunk
+    STREAM_THRESHOLD_MB = 256         # uploads above this size are streamed
     # Velocity detection
     VELOCITY_WINDOW_HOURS = 1
     VELOCITY_MIN_TXN = 8          # transactions in window to flag
     VELOCITY_POINTS = 25
+    # (window hours, min txns) checked together; a sender is reported for the shortest window it trips
+    VELOCITY_WINDOWS = [(VELOCITY_WINDOW_HOURS, VELOCITY_MIN_TXN), (24, 40), (168, 150)]
     # Round-trip detection
     ROUND_TRIP_POINTS = 18
+    ROUND_TRIP_TOLERANCE = 0.05       # |fwd - rev| / fwd
+    ROUND_TRIP_MAX_GAP_HOURS = None   # max time between the two legs (None = unbounded)
+
+# granularity -> (bucket seconds, epoch offset, label unit); the Unix epoch fell on a Thursday
+TIMELINE_BUCKETS = {
+    'hourly': (3600, 0, 'h'),
+    'daily': (86400, 0, 'D'),
+    'weekly': (7 * 86400, -3 * 86400, 'D'),
+}
+
+# Smurfing sides: (hub column, member column, hub label, member label, ring prefix, pattern type)
+SMURF_SIDES = (
+    ('sender_code', 'receiver_code', 'SMURF_BOSS', 'SMURF_MULE', 'SMURF_OUT', 'Structured Fan-Out'),
+    ('receiver_code', 'sender_code', 'SMURF_TARGET', 'SMURF_SENDER', 'SMURF_IN', 'Structured Fan-In'),
+)
+
+# ── Detector registry ───────────────────────────────────────────────────
+# name -> {"run", "inputs", "rescope"}; detectors run concurrently and are merged in this order
+DETECTORS: dict[str, dict] = {}
+
+# What a detector may declare as input, computed once per run and shared read-only
+DETECTOR_INPUTS = {
+    'edges': lambda engine: engine.df,                                  # one row per transfer
+    'pairs': lambda engine: engine.pairs,                               # per (sender, receiver) aggregates
+    'epoch': lambda engine: to_epoch_seconds(engine.df['timestamp']),   # transfer times, aligned with edges
+}
+
+_detector_pool: ThreadPoolExecutor | None = None
+_detector_pool_lock = threading.Lock()
+
+
+def register_detector(name: str, inputs: tuple[str, ...], rescope=None):
+    """Decorator adding fn(engine, **inputs) -> contribution to the registry.
+
+    A detector only reads engine state. Its contribution dict may hold
+    "findings" [(key, ring, [(codes, amount, fraud_type), ...])], keyed so
+    append() can retract them; "assigns" [(codes, amount, fraud_type)] for
+    score-only points; and "stats", kept as engine.detector_stats[name].
+
+    rescope(engine, new_rows, inputs) narrows a detector to what appended
+    rows touch, returning (finding keys to retract, inputs) or None to skip
+    it. Detectors without one re-run in full on append, replacing their
+    findings (score-only assigns can't be replaced, so use findings).
+    """
+    def register(fn):
+        DETECTORS[name] = {"run": fn, "inputs": tuple(inputs), "rescope": rescope}
+        return fn
+    return register
+
+
+def _get_detector_pool() -> ThreadPoolExecutor:
+    # Threads, not processes: detectors read the engine's frames in place, and
+    # the heavy kernels (pandas groupbys, NumPy sorts, the cycle process pool)
+    # run outside the GIL
+    global _detector_pool
+    with _detector_pool_lock:
+        if _detector_pool is None:
+            _detector_pool = ThreadPoolExecutor(max_workers=FraudConfig.DETECTOR_WORKERS, thread_name_prefix='detector')
+        return _detector_pool
+
+
+def _pair_key(frame: pd.DataFrame) -> np.ndarray:
+    return frame['sender_code'].to_numpy(np.int64) << 32 | frame['receiver_code'].to_numpy(np.int64)
+
+
+def _unordered_key(frame: pd.DataFrame) -> np.ndarray:
+    s, r = frame['sender_code'].to_numpy(np.int64), frame['receiver_code'].to_numpy(np.int64)
+    return np.minimum(s, r) << 32 | np.maximum(s, r)
+
+
+def _cycle_uses(cycle: tuple, pair_keys: set) -> bool:
+    """Whether a cycle runs along any of the (sender << 32 | receiver) pair keys."""
+    return any((u << 32 | v) in pair_keys for u, v in zip(cycle, cycle[1:] + cycle[:1]))
 
 class FraudEngine:
-    def __init__(self, df: pd.DataFrame):
-        self.df = self._universal_data_cleaner(df)
-        all_accounts = pd.concat([self.df['sender_id'], self.df['receiver_id']]).dropna().unique()
-        self.points = {account: 0 for account in all_accounts}
+    def __init__(self, df: pd.DataFrame, timings: Timings | None = None):
+        timings = timings or Timings()
+        timings.count('rows_in', len(df))
+        with timings.stage('clean'):
+            df = self._universal_data_cleaner(df)
+        with timings.stage('encode_accounts'):
+            acc = EdgeAccumulator()
+            compact = acc.add(df)
+        metadata_cols = [c for c in df.columns if c not in CORE_COLUMNS]
+        df['sender_code'] = compact['sender_code'].to_numpy()
+        df['receiver_code'] = compact['receiver_code'].to_numpy()
+        self._load(df, acc, metadata_cols, timings)
+
+    @classmethod
+    def from_csv_stream(cls, source, memory_budget_mb: int = FraudConfig.STREAM_MEMORY_BUDGET_MB) -> 'FraudEngine':
+        """Build an engine from a CSV path or file object one chunk at a time.
+
+        Only compact code/amount/timestamp columns are kept per row, so peak
+        parsing memory follows the budget rather than the file size. Node
+        metadata (non-core columns) is not retained in this mode.
+        """
+        acc, timings = EdgeAccumulator(), Timings()
+        with timings.stage('stream_ingest'):   # parse, clean and encode, interleaved per chunk
+            frames = [acc.add(cls._universal_data_cleaner(chunk, keep_metadata=False))
+                      for chunk in iter_csv_chunks(source, memory_budget_mb * 2**20)]
+        if not frames:
+            raise ValueError("CSV contains no transactions")
+        engine = cls.__new__(cls)
+        engine._load(pd.concat(frames, ignore_index=True), acc, [], timings)
+        return engine
+
+    @staticmethod
+    def streams_upload(upload) -> bool:
+        """Whether an uploaded file object is a CSV large enough to stream (see from_upload_file)."""
+        upload.seek(0, io.SEEK_END)
+        size = upload.tell()
+        upload.seek(0)
+        streamed = size > FraudConfig.STREAM_THRESHOLD_MB * 2**20 and sniff_format(upload.read(8)) == 'csv'
+        upload.seek(0)
+        return streamed
+
+    @classmethod
+    def from_upload_file(cls, upload) -> 'FraudEngine':
+        """Build an engine from an uploaded file object (e.g. a spooled temp file).
+
+        Large CSVs are streamed from the file in chunks, so the upload itself
+        is never held in memory; anything else is read whole into from_upload.
+        """
+        if cls.streams_upload(upload):
+            return cls.from_csv_stream(upload)
+        return cls.from_upload(upload.read())
+
+    @classmethod
+    def from_upload(cls, raw: bytes) -> 'FraudEngine':
+        """Build an engine from uploaded bytes: Parquet, Arrow IPC or CSV (sniffed by magic bytes)."""
+        if sniff_format(raw) == 'csv' and len(raw) > FraudConfig.STREAM_THRESHOLD_MB * 2**20:
+            return cls.from_csv_stream(io.BytesIO(raw))
+        timings = Timings()
+        with timings.stage('parse'):
+            df = read_upload(raw, FraudConfig.CSV_PARSER_BACKEND)
+        return cls(df, timings)
+
+    def _load(self, df: pd.DataFrame, acc: EdgeAccumulator, metadata_cols: list[str], timings: Timings):
+        self.df = df
+        self.metadata_cols = metadata_cols
+        with timings.stage('pair_table'):
+            self.pairs = acc.pair_table()
+        self.timings = timings     # stages and counters of the latest run or append
+        self._acc = acc   # kept for append()
+        self.accounts = AccountTable(acc.encoder.ids(), FraudConfig.HIGH_RISK_COUNTRIES + FraudConfig.STANDARD_COUNTRIES)
+        self.accounts.sent[:] = acc.sent
+        self.accounts.received[:] = acc.received
         self.fraud_rings = []
-        self.suspicious_nodes = set()
-        self.node_labels = {account: set() for account in self.points.keys()}
-        self.node_fraud_count = {account: 0 for account in self.points.keys()}
-
-        self.node_countries = {}
-        for acc in all_accounts:
-            h = int(hashlib.md5(str(acc).encode()).hexdigest(), 16)
-            if h % 100 < 8: 
-                self.node_countries[acc] = FraudConfig.HIGH_RISK_COUNTRIES[h % len(FraudConfig.HIGH_RISK_COUNTRIES)]
-            else:
-                standard = ['IN', 'US', 'GB', 'AE', 'SG']
-                self.node_countries[acc] = standard[h % len(standard)]
-
-    def _universal_data_cleaner(self, df: pd.DataFrame) -> pd.DataFrame:
+        self.detector_stats = {}   # detector name -> stats from its last contribution
+        self._findings = {}        # finding key -> (detector, ring, assigns behind it); see append()
+        self._changed = None       # codes touched while an append() runs
+        self._centrality_cache = {}
+        self._node_store = None
+        self._graphs = None        # (CSRGraph of all pairs, its reverse), built on first use and kept across appends
+
+        self.accounts.country[:] = hash_countries(
+            self.accounts.ids, len(FraudConfig.HIGH_RISK_COUNTRIES), len(FraudConfig.STANDARD_COUNTRIES))
+        timings.count('rows', len(df))
+        timings.count('accounts', len(self.accounts))
+        timings.count('pairs', len(self.pairs))
+
+    def __getstate__(self) -> dict:
+        # Lookup caches are rebuilt on demand rather than shipped between processes
+        return {**self.__dict__, "_centrality_cache": {}, "_node_store": None, "_graphs": None}
+
+    @staticmethod
+    def _universal_data_cleaner(df: pd.DataFrame, keep_metadata: bool = True) -> pd.DataFrame:
         df = df.dropna(how='all')
-        df.columns = df.columns.astype(str).str.strip().str.lower()
-        mapping = {}
-        for col in df.columns:
-            if re.search(r'sender|source|from|origin|payer', col): mapping[col] = 'sender_id'
-            elif re.search(r'receiver|target|to|dest|beneficiary|payee', col): mapping[col] = 'receiver_id'
-            elif re.search(r'amount|value|amt|total|price', col): mapping[col] = 'amount'
-            elif re.search(r'time|date|created', col): mapping[col] = 'timestamp'
-            elif re.search(r'id|txid|reference|hash', col): mapping[col] = 'transaction_id'
-        df.rename(columns=mapping, inplace=True)
+        df.columns = normalize_headers(df.columns)
+        schema = infer_schema(df.columns)
+        df.rename(columns=schema["mapping"], inplace=True)
 
         required = ['sender_id', 'receiver_id', 'amount']
         missing = [col for col in required if col not in df.columns]
         if missing: raise ValueError(f"CSV Missing logical columns for: {', '.join(missing)}")
         
+        if not keep_metadata: df = df[[col for col in CORE_COLUMNS if col in df.columns]]
         if 'timestamp' not in df.columns: df['timestamp'] = pd.Timestamp.now()
-        if 'transaction_id' not in df.columns: df['transaction_id'] = [f"GEN_TX_{i}" for i in range(len(df))]
+        if keep_metadata and 'transaction_id' not in df.columns: df['transaction_id'] = [f"GEN_TX_{i}" for i in range(len(df))]
 
         df['sender_id'] = df['sender_id'].astype(str).str.strip()
         df['receiver_id'] = df['receiver_id'].astype(str).str.strip()
-        df['amount'] = df['amount'].astype(str).str.replace(r'[^\d\.-]', '', regex=True)
-        df['amount'] = pd.to_numeric(df['amount'], errors='coerce').fillna(0.0)
+        df['amount'] = parse_amount(df['amount'])
         df = df[df['amount'] > 0].copy()
-        df['timestamp'] = pd.to_datetime(df['timestamp'], errors='coerce').fillna(pd.Timestamp.now())
+        df['timestamp'] = parse_timestamp(df['timestamp'], schema).fillna(pd.Timestamp.now())
         return df
 
-    def assign_points(self, nodes, amount, fraud_type):
-        for node in nodes:
-            self.points[node] += amount
-            self.suspicious_nodes.add(node)
-            self.node_labels[node].add(fraud_type)
-            self.node_fraud_count[node] += 1
-
-    def detect_geo_risk(self):
-        self.df['sender_country'] = self.df['sender_id'].map(self.node_countries)
-        self.df['receiver_country'] = self.df['receiver_id'].map(self.node_countries)
-        high_risk_set = set(FraudConfig.HIGH_RISK_COUNTRIES)
-        cross_mask = self.df['sender_country'] != self.df['receiver_country']
-        hr_mask = self.df['sender_country'].isin(high_risk_set) | self.df['receiver_country'].isin(high_risk_set)
-        suspicious_geo = self.df[cross_mask & hr_mask]
-        offshore_nodes = set(suspicious_geo['sender_id']).union(set(suspicious_geo['receiver_id']))
-        for node in offshore_nodes:
-            self.assign_points([node], FraudConfig.GEO_RISK_POINTS, 'OFFSHORE_ROUTING')
-
-    def detect_smurfing(self):
-        df_low = self.df[self.df['amount'] <= FraudConfig.SMURF_MAX_AMOUNT]
-        out_counts = df_low.groupby('sender_id')
-        for sender, group in out_counts:
-            receivers = group['receiver_id'].unique()
-            if len(receivers) >= FraudConfig.SMURF_MIN_UNIQUE_ACCOUNTS:
-                amounts = group['amount'].values
-                mean_amt = np.mean(amounts)
-                std_dev = np.std(amounts)
-                is_uniform = std_dev < (FraudConfig.SMURF_STD_DEV_TOLERANCE * mean_amt) if mean_amt > 0 else False
-                score = FraudConfig.SMURF_POINTS if is_uniform else FraudConfig.SMURF_POINTS // 2
-                self.assign_points([sender], score, 'SMURF_BOSS_UNIFORM' if is_uniform else 'SMURF_BOSS')
-                self.assign_points(receivers, score // 2, 'SMURF_MULE')
-                self.fraud_rings.append({"ring_id": f"SMURF_OUT_{str(sender)[-4:]}", "pattern_type": "Structured Fan-Out", "member_count": len(receivers) + 1, "nodes": [sender] + list(receivers), "score": score})
-
-        in_counts = df_low.groupby('receiver_id')
-        for target, group in in_counts:
-            senders = group['sender_id'].unique()
-            if len(senders) >= FraudConfig.SMURF_MIN_UNIQUE_ACCOUNTS:
-                amounts = group['amount'].values
-                mean_amt = np.mean(amounts)
-                std_dev = np.std(amounts)
-                is_uniform = std_dev < (FraudConfig.SMURF_STD_DEV_TOLERANCE * mean_amt) if mean_amt > 0 else False
-                score = FraudConfig.SMURF_POINTS if is_uniform else FraudConfig.SMURF_POINTS // 2
-                self.assign_points([target], score, 'SMURF_TARGET_UNIFORM' if is_uniform else 'SMURF_TARGET')
-                self.assign_points(senders, score // 2, 'SMURF_SENDER')
-                self.fraud_rings.append({"ring_id": f"SMURF_IN_{str(target)[-4:]}", "pattern_type": "Structured Fan-In", "member_count": len(senders) + 1, "nodes": [target] + list(senders), "score": score})
-
-    def detect_cycles(self):
-        G_multi = nx.from_pandas_edgelist(self.df, 'sender_id', 'receiver_id', ['amount'], create_using=nx.MultiDiGraph())
-        G_simple = nx.DiGraph(G_multi)
-        try:
-            cycles = list(nx.simple_cycles(G_simple, length_bound=FraudConfig.CYCLE_MAX_LENGTH))
-            for i, cycle in enumerate(cycles):
-                if len(cycle) > 2:
-                    edge_counts = [G_multi.number_of_edges(cycle[j], cycle[(j + 1) % len(cycle)]) for j in range(len(cycle))]
-                    loop_completions = min(edge_counts)
-                    if loop_completions > 0:
-                        pts = loop_completions * FraudConfig.CYCLE_BASE_POINTS
-                        self.assign_points(cycle, pts, 'CYCLE')
-                        self.fraud_rings.append({"ring_id": f"CYCLE_{i+1}", "pattern_type": f"Cyclic Wash ({loop_completions}x)", "member_count": len(cycle), "nodes": list(cycle), "score": pts * len(cycle)})
-        except Exception:
-            pass
 
-    def detect_velocity_burst(self):
+    @property
+    def node_store(self) -> NodeStore:
+        """Per-account transfer index behind the node-detail lookups, built on first use."""
+        if self._node_store is None:
+            self._node_store = NodeStore(self.df, self.accounts, self.metadata_cols)
+        return self._node_store
+
+    def assign_points(self, codes, amount, fraud_type):
+        self.accounts.assign(codes, amount, fraud_type)
+
+    def _account_id(self, code) -> str:
+        return str(self.accounts.ids[code])
+
+    @property
+    def cycle_search(self) -> dict:
+        return self.detector_stats.get('cycles', {"cycles_found": 0, "truncated": False, "reason": None})
+
+    # ── Detector runs ───────────────────────────────────────────────────────
+    def _detector_inputs(self, names) -> dict:
+        needed = {name for detector in names for name in DETECTORS[detector]["inputs"]}
+        with self.timings.stage('detector_inputs'):
+            return {name: DETECTOR_INPUTS[name](self) for name in needed}
+
+    def _run_detector(self, name: str, inputs: dict) -> dict:
+        with self.timings.stage(f'detector.{name}'):
+            contribution = DETECTORS[name]["run"](self, **inputs)
+        self.timings.count(f'findings.{name}', len(contribution.get("findings", [])))
+        return contribution
+
+    def _run_detectors(self, jobs: list[tuple[str, dict]]):
+        """Run (detector, inputs) jobs, concurrently when DETECTOR_WORKERS > 1, and merge in job order."""
+        if FraudConfig.DETECTOR_WORKERS > 1 and len(jobs) > 1:
+            pool = _get_detector_pool()
+            futures = [pool.submit(self._run_detector, name, inputs) for name, inputs in jobs]
+            contributions = [future.result() for future in futures]
+        else:
+            contributions = [self._run_detector(name, inputs) for name, inputs in jobs]
+        with self.timings.stage('merge'):
+            for (name, _), contribution in zip(jobs, contributions):
+                self._merge(name, contribution)
+
+    def _merge(self, detector: str, contribution: dict):
+        """Apply a contribution: points batched per label, then its findings, rings and stats."""
+        findings = contribution.get("findings", [])
+        by_label = {}
+        for codes, amount, fraud_type in [*contribution.get("assigns", []), *(a for _, _, assigns in findings for a in assigns)]:
+            codes = np.asarray(codes, dtype=np.int64).ravel()
+            by_label.setdefault(fraud_type, []).append((codes, np.broadcast_to(amount, codes.shape)))
+        for fraud_type, parts in by_label.items():
+            codes = np.concatenate([codes for codes, _ in parts])
+            self.assign_points(codes, np.concatenate([amounts for _, amounts in parts]), fraud_type)
+            if self._changed is not None:
+                self._changed.append(codes)
+        for key, ring, assigns in findings:
+            self._findings[key] = (detector, ring, assigns)
+            self.fraud_rings.append(ring)
+        if "stats" in contribution:
+            self.detector_stats[detector] = contribution["stats"]
+
+    def _retract(self, key):
+        """Withdraw a recorded finding's points and labels (no-op for unknown keys)."""
+        if key not in self._findings:
+            return
+        _, _, assigns = self._findings.pop(key)
+        for codes, amount, fraud_type in assigns:
+            self.accounts.retract(codes, amount, fraud_type)
+            self._changed.append(np.asarray(codes, dtype=np.int64))
+
+    def _pair_graph(self) -> tuple[CSRGraph, CSRGraph]:
+        """CSRGraph of the whole pair table and its reverse; append() updates them in place of a rebuild."""
+        if self._graphs is None:
+            graph = CSRGraph.from_pairs(self.pairs, len(self.accounts))
+            self._graphs = graph, graph.reversed()
+        return self._graphs
+
+    def _rows_of(self, codes: np.ndarray, col: str) -> np.ndarray:
+        """Row mask of the ledger where `col` is one of `codes`."""
+        mark = np.zeros(len(self.accounts), dtype=bool)
+        mark[codes] = True
+        return mark[self.df[col].to_numpy()]
+
+    # ── Detectors ───────────────────────────────────────────────────────────
+    def _rescope_geo(self, new: pd.DataFrame, inputs: dict):
+        pairs = inputs['pairs']
+        return [], {"pairs": pairs[np.isin(_pair_key(pairs), _pair_key(new))]}
+
+    @register_detector('geo_risk', ('pairs',), rescope=_rescope_geo)
+    def detect_geo_risk(self, pairs: pd.DataFrame) -> dict:
+        """Cross-border pairs touching a high-risk country; accounts already flagged are skipped."""
+        country = self.accounts.country
+        s_country = country[pairs['sender_code'].values]
+        r_country = country[pairs['receiver_code'].values]
+        n_high = len(FraudConfig.HIGH_RISK_COUNTRIES)
+        cross_mask = s_country != r_country
+        hr_mask = (s_country < n_high) | (r_country < n_high)
+        suspicious_geo = pairs[cross_mask & hr_mask]
+        offshore_nodes = np.union1d(suspicious_geo['sender_code'].values, suspicious_geo['receiver_code'].values)
+        offshore_nodes = offshore_nodes[(self.accounts.labels[offshore_nodes] & LABEL_BITS['OFFSHORE_ROUTING']) == 0]
+        return {"assigns": [(offshore_nodes, FraudConfig.GEO_RISK_POINTS, 'OFFSHORE_ROUTING')]}
+
+    def _rescope_smurfing(self, new: pd.DataFrame, inputs: dict):
+        new_low = new[new['amount'] <= FraudConfig.SMURF_MAX_AMOUNT]
+        hubs = {side[0]: np.unique(new_low[side[0]].to_numpy(np.int64)) for side in SMURF_SIDES}
+        keys = [(side[4], hub) for side in SMURF_SIDES for hub in hubs[side[0]].tolist()]
+        rows = self._rows_of(hubs['sender_code'], 'sender_code') | self._rows_of(hubs['receiver_code'], 'receiver_code')
+        return keys, {"edges": inputs['edges'][rows], "hubs": hubs}
+
+    @register_detector('smurfing', ('edges',), rescope=_rescope_smurfing)
+    def detect_smurfing(self, edges: pd.DataFrame, hubs: dict | None = None) -> dict:
+        """Structured fan-out and fan-in below SMURF_MAX_AMOUNT; `hubs` (hub column -> codes) limits who is scored."""
+        df_low = edges[edges['amount'] <= FraudConfig.SMURF_MAX_AMOUNT]
+        findings = []
+        for side in SMURF_SIDES:
+            rows = df_low if hubs is None else df_low[np.isin(df_low[side[0]].to_numpy(), hubs[side[0]])]
+            findings += self._structured_hubs(rows, *side)
+        return {"findings": findings}
+
+    def _structured_hubs(self, df_low, hub_col, member_col, hub_label, member_label, ring_prefix, pattern_type) -> list:
+        """One side of smurfing: hubs linked to >= SMURF_MIN_UNIQUE_ACCOUNTS counterparties below the threshold."""
+        links = df_low[[hub_col, member_col]].drop_duplicates()
+        fan = links.groupby(hub_col, sort=True).size()
+        hubs = fan.index.values[fan.values >= FraudConfig.SMURF_MIN_UNIQUE_ACCOUNTS]
+        if not len(hubs):
+            return []
+
+        amounts = df_low.loc[df_low[hub_col].isin(hubs), [hub_col, 'amount']].groupby(hub_col, sort=True)['amount']
+        mean_amt = amounts.mean().values
+        std_dev = amounts.std(ddof=0).values
+        is_uniform = (mean_amt > 0) & (std_dev < FraudConfig.SMURF_STD_DEV_TOLERANCE * mean_amt)
+        scores = np.where(is_uniform, FraudConfig.SMURF_POINTS, FraudConfig.SMURF_POINTS // 2)
+
+        hub_links = links[links[hub_col].isin(hubs)]
+        members_by_hub = hub_links.groupby(hub_col, sort=True)[member_col].agg(list)
+        findings = []
+        for hub, members, score, uniform in zip(hubs.tolist(), members_by_hub.values, scores.tolist(), is_uniform.tolist()):
+            ring = {"ring_id": f"{ring_prefix}_{self._account_id(hub)[-4:]}", "pattern_type": pattern_type, "member_count": len(members) + 1, "nodes": [hub] + members, "score": score}
+            findings.append(((ring_prefix, hub), ring, [([hub], score, f'{hub_label}_UNIFORM' if uniform else hub_label), (members, score // 2, member_label)]))
+        return findings
+
+    def _rescope_cycles(self, new: pd.DataFrame, inputs: dict):
+        """Pairs that gained transfers, the CYCLE_MAX_LENGTH neighbourhood around them and the cycles through them."""
+        touched = np.unique(_pair_key(new[new['sender_code'] != new['receiver_code']]))
+        if not len(touched):
+            return None
+        touched_keys = set(touched.tolist())
+        keys = [key for key in self._findings if key[0] == 'CYCLE' and _cycle_uses(key[1], touched_keys)]
+        ring_ids = {key[1]: self._findings[key][1]["ring_id"] for key in keys}
+
+        pairs, edges = inputs['pairs'], inputs['edges']
+        graph, reverse = self._pair_graph()
+        ball = cycle_ball(graph, touched >> 32, touched & 0xFFFFFFFF, FraudConfig.CYCLE_MAX_LENGTH, reverse)
+        in_pairs = ball[pairs['sender_code'].to_numpy()] & ball[pairs['receiver_code'].to_numpy()]
+        in_edges = ball[edges['sender_code'].to_numpy()] & ball[edges['receiver_code'].to_numpy()]
+        return keys, {"pairs": pairs[in_pairs], "edges": edges[in_edges], "epoch": inputs['epoch'][in_edges],
+                      "through": touched, "ring_ids": ring_ids}
+
+    @register_detector('cycles', ('pairs', 'edges', 'epoch'), rescope=_rescope_cycles)
+    def detect_cycles(self, pairs: pd.DataFrame, edges: pd.DataFrame, epoch: np.ndarray,
+                      through: np.ndarray | None = None, ring_ids: dict | None = None) -> dict:
+        """Layering loops; with `through` (pair keys) only cycles using one of those pairs, keeping `ring_ids`."""
+        search = self._search_cycles(pairs, edges, epoch, through)
+        if through is None:
+            findings = [self._cycle_finding(cycle, n, f"CYCLE_{i+1}") for i, (cycle, n) in enumerate(search["cycles"])]
+            return {"findings": findings, "stats": {
+                "cycles_found": len(findings), "components": search["components"], "truncated": search["truncated"],
+                "reason": search["reason"], "ring_seq": len(findings)}}
+
+        previous = self.cycle_search
+        seq, findings = previous.get("ring_seq", previous["cycles_found"]), []
+        for cycle, loop_completions in search["cycles"]:
+            if cycle not in ring_ids:
+                seq += 1
+            findings.append(self._cycle_finding(cycle, loop_completions, ring_ids.get(cycle, f"CYCLE_{seq}")))
+        kept = sum(key[0] == 'CYCLE' for key in self._findings)   # replaced cycles were retracted already
+        return {"findings": findings, "stats": {
+            **previous, "cycles_found": kept + len(findings), "truncated": previous["truncated"] or search["truncated"],
+            "reason": search["reason"] or previous["reason"], "ring_seq": seq}}
+
+    def _search_cycles(self, pairs: pd.DataFrame, edges: pd.DataFrame, epoch: np.ndarray,
+                       through: np.ndarray | None = None) -> dict:
+        """Cycle search over the given pairs; edges/epoch must be exactly the transfers behind them."""
+        graph = CSRGraph.from_pairs(pairs, len(self.accounts))
+        temporal = None
+        if FraudConfig.CYCLE_TIME_RESPECTING:
+            window = FraudConfig.CYCLE_WINDOW_HOURS
+            temporal = TemporalEdgeIndex.build(
+                graph, edges['sender_code'].to_numpy(np.int64), edges['receiver_code'].to_numpy(np.int64),
+                epoch, edges['amount'].to_numpy(np.float64),
+                window_s=None if window is None else window * 3600, max_drop=FraudConfig.LAYER_CUT_PERCENTAGE)
+        if through is not None:
+            return search_cycles_through(graph, through >> 32, through & 0xFFFFFFFF, FraudConfig.CYCLE_MAX_LENGTH,
+                                         max_cycles=FraudConfig.CYCLE_MAX_COUNT, time_budget_s=FraudConfig.CYCLE_TIME_BUDGET_S,
+                                         temporal=temporal)
+        return search_cycles(graph, FraudConfig.CYCLE_MAX_LENGTH, max_cycles=FraudConfig.CYCLE_MAX_COUNT,
+                             time_budget_s=FraudConfig.CYCLE_TIME_BUDGET_S, workers=FraudConfig.CYCLE_WORKERS,
+                             parallel_min_edges=FraudConfig.CYCLE_PARALLEL_MIN_EDGES, temporal=temporal)
+
+    @staticmethod
+    def _cycle_finding(cycle: tuple, loop_completions: int, ring_id: str) -> tuple:
+        pts = loop_completions * FraudConfig.CYCLE_BASE_POINTS
+        ring = {"ring_id": ring_id, "pattern_type": f"Cyclic Wash ({loop_completions}x)", "member_count": len(cycle), "nodes": list(cycle), "score": pts * len(cycle)}
+        return ('CYCLE', cycle), ring, [(list(cycle), pts, 'CYCLE')]
+
+    def _rescope_velocity(self, new: pd.DataFrame, inputs: dict):
+        senders = np.unique(new['sender_code'].to_numpy(np.int64))
+        rows = self._rows_of(senders, 'sender_code')
+        return [('VEL', sender) for sender in senders.tolist()], {"edges": inputs['edges'][rows], "epoch": inputs['epoch'][rows]}
+
+    @register_detector('velocity_burst', ('edges', 'epoch'), rescope=_rescope_velocity)
+    def detect_velocity_burst(self, edges: pd.DataFrame, epoch: np.ndarray) -> dict:
         """Flag accounts sending an unusually high number of txns in a short rolling window."""
-        df = self.df.copy()
-        df['ts_epoch'] = df['timestamp'].astype(np.int64) // 10**9  # seconds
-        window_sec = FraudConfig.VELOCITY_WINDOW_HOURS * 3600
-        sender_groups = df.groupby('sender_id')
-        for sender, group in sender_groups:
-            times = sorted(group['ts_epoch'].tolist())
-            # Sliding window count
-            for i, t_start in enumerate(times):
-                count = sum(1 for t in times[i:] if t - t_start <= window_sec)
-                if count >= FraudConfig.VELOCITY_MIN_TXN:
-                    self.assign_points([sender], FraudConfig.VELOCITY_POINTS, 'VELOCITY_BURST')
-                    self.fraud_rings.append({
-                        "ring_id": f"VEL_{str(sender)[-4:]}",
-                        "pattern_type": f"Velocity Burst ({count} txns/{FraudConfig.VELOCITY_WINDOW_HOURS}h)",
-                        "member_count": 1,
-                        "nodes": [sender],
-                        "score": FraudConfig.VELOCITY_POINTS
-                    })
-                    break  # one flag per sender is enough
-
-    def detect_round_trips(self):
-        """Detect A→B and B→A flows with matching amounts (±5%): classic layering."""
-        # Build a map: (sender, receiver) -> list of amounts
-        fwd: dict = {}
-        for _, row in self.df.iterrows():
-            key = (str(row['sender_id']), str(row['receiver_id']))
-            fwd.setdefault(key, []).append(float(row['amount']))
-        
-        seen: set = set()
-        for (a, b), amts_fwd in fwd.items():
-            if (b, a) in fwd and (a, b) not in seen and (b, a) not in seen:
-                amts_rev = fwd[(b, a)]
-                # Check if any forward amount matches any reverse amount within 5%
-                for af in amts_fwd:
-                    for ar in amts_rev:
-                        if af > 0 and abs(af - ar) / af <= 0.05:
-                            seen.add((a, b))
-                            self.assign_points([a, b], FraudConfig.ROUND_TRIP_POINTS, 'ROUND_TRIP')
-                            self.fraud_rings.append({
-                                "ring_id": f"RT_{a[-4:]}_{b[-4:]}",
-                                "pattern_type": "Round-Trip Layering",
-                                "member_count": 2,
-                                "nodes": [a, b],
-                                "score": FraudConfig.ROUND_TRIP_POINTS * 2
-                            })
-                            break
-                    else:
-                        continue
-                    break
+        if edges.empty:
+            return {}
+        senders = edges['sender_code'].to_numpy(np.int64)
+        order = np.lexsort((epoch, senders))
+        s = senders[order]
+        t = epoch[order] - epoch.min()
+        # One sorted key across all senders: each sender's times sit in their own
+        # band, so a window search never crosses into the next sender.
+        band = int(t.max()) + max(hours for hours, _ in FraudConfig.VELOCITY_WINDOWS) * 3600 + 1
+        key = s * band + t
+        start = np.arange(len(key))
+
+        window_of = np.zeros(len(self.accounts), dtype=np.int64)
+        count_of = np.zeros(len(self.accounts), dtype=np.int64)
+        for hours, min_txn in FraudConfig.VELOCITY_WINDOWS:
+            counts = np.searchsorted(key, key + hours * 3600, side='right') - start
+            hit = counts >= min_txn
+            hit_senders, first = np.unique(s[hit], return_index=True)
+            new = window_of[hit_senders] == 0
+            window_of[hit_senders[new]] = hours
+            count_of[hit_senders[new]] = counts[hit][first][new]
+
+        flagged = np.flatnonzero(window_of)
+        findings = []
+        for sender, count, hours in zip(flagged.tolist(), count_of[flagged].tolist(), window_of[flagged].tolist()):
+            findings.append((('VEL', sender), {
+                "ring_id": f"VEL_{self._account_id(sender)[-4:]}",
+                "pattern_type": f"Velocity Burst ({count} txns/{hours}h)",
+                "member_count": 1,
+                "nodes": [sender],
+                "score": FraudConfig.VELOCITY_POINTS
+            }, [([sender], FraudConfig.VELOCITY_POINTS, 'VELOCITY_BURST')]))
+        return {"findings": findings}
+
+    def _rescope_round_trips(self, new: pd.DataFrame, inputs: dict):
+        dirty = np.unique(_unordered_key(new))
+        pairs = inputs['pairs']
+        rows = np.isin(_unordered_key(inputs['edges']), dirty)
+        keys = [('RT', key >> 32, key & 0xFFFFFFFF) for key in dirty.tolist()]
+        return keys, {"pairs": pairs[np.isin(_unordered_key(pairs), dirty)], "edges": inputs['edges'][rows], "epoch": inputs['epoch'][rows]}
+
+    @register_detector('round_trips', ('pairs', 'edges', 'epoch'), rescope=_rescope_round_trips)
+    def detect_round_trips(self, pairs: pd.DataFrame, edges: pd.DataFrame, epoch: np.ndarray) -> dict:
+        """Detect A→B and B→A flows with matching amounts (±ROUND_TRIP_TOLERANCE): classic layering."""
+        tol = FraudConfig.ROUND_TRIP_TOLERANCE
+        gap_hours = FraudConfig.ROUND_TRIP_MAX_GAP_HOURS
+
+        # Self-join the pair table against its reverse, keeping pairs whose amount
+        # (and time) ranges can meet in either direction. The filter is symmetric,
+        # so both legs of every surviving pair survive.
+        cols = ['sender_code', 'receiver_code', 'amount_min', 'amount_max', 'ts_min', 'ts_max']
+        fwd = pairs[cols].reset_index(drop=True).reset_index(names='pair_id')
+        rev = fwd.rename(columns={'sender_code': 'receiver_code', 'receiver_code': 'sender_code', 'pair_id': 'rev_id',
+                                  'amount_min': 'rev_min', 'amount_max': 'rev_max', 'ts_min': 'rev_ts_min', 'ts_max': 'rev_ts_max'})
+        cand = fwd.merge(rev, on=['sender_code', 'receiver_code'])
+        keep = (cand['rev_max'] >= cand['amount_min'] * (1 - tol)) & (cand['rev_min'] <= cand['amount_max'] / (1 - tol))
+        if gap_hours is not None:
+            gap = pd.Timedelta(hours=gap_hours)
+            keep &= (cand['rev_ts_max'] >= cand['ts_min'] - gap) & (cand['rev_ts_min'] <= cand['ts_max'] + gap)
+        cand = cand[keep].sort_values('pair_id', ignore_index=True)
+        if cand.empty:
+            return {}
+        rev_local = pd.Index(cand['pair_id']).get_indexer(cand['rev_id'])
+
+        # Legs of candidate pairs, tagged with their local candidate index
+        row_key = _pair_key(edges)
+        cand_key = cand['sender_code'].to_numpy(np.int64) << 32 | cand['receiver_code'].to_numpy(np.int64)
+        leg_pair = pd.Index(cand_key).get_indexer(row_key)
+        in_cand = leg_pair >= 0
+        leg_pair = leg_pair[in_cand]
+        leg_amt = edges['amount'].to_numpy(np.float64)[in_cand]
+
+        # Sorted-array search: rank amounts and band bounds together so (pair, amount)
+        # becomes one monotone int64 key, then find each leg's band in its reverse pair.
+        lo, hi = leg_amt * (1 - tol), leg_amt * (1 + tol)
+        _, ranks = np.unique(np.concatenate([leg_amt, lo, hi]), return_inverse=True)
+        n, width = len(leg_amt), int(ranks.max()) + 1
+        amt_rank, lo_rank, hi_rank = ranks[:n], ranks[n:2 * n], ranks[2 * n:]
+        order = np.lexsort((amt_rank, leg_pair))
+        sorted_key = leg_pair[order].astype(np.int64) * width + amt_rank[order]
+        target = rev_local[leg_pair].astype(np.int64) * width
+        band_lo = np.searchsorted(sorted_key, target + lo_rank, side='left')
+        band_hi = np.searchsorted(sorted_key, target + hi_rank, side='right')
+
+        if gap_hours is None:
+            leg_matched = band_hi > band_lo
+        else:
+            leg_epoch = epoch[in_cand]
+            sizes = band_hi - band_lo
+            owner = np.repeat(np.arange(n), sizes)
+            offset = np.arange(sizes.sum()) - np.repeat(np.cumsum(sizes) - sizes, sizes)
+            partner = order[np.repeat(band_lo, sizes) + offset]
+            close = np.abs(leg_epoch[owner] - leg_epoch[partner]) <= gap_hours * 3600
+            leg_matched = np.bincount(owner[close], minlength=n) > 0
+
+        # First matching orientation of each unordered pair, in first-seen pair order
+        matched = cand[np.bincount(leg_pair[leg_matched], minlength=len(cand)) > 0]
+        a_codes, b_codes = matched['sender_code'].to_numpy(np.int64), matched['receiver_code'].to_numpy(np.int64)
+        unordered = np.minimum(a_codes, b_codes) << 32 | np.maximum(a_codes, b_codes)
+        _, first = np.unique(unordered, return_index=True)
+        first.sort()
+        findings = []
+        for a, b in zip(a_codes[first].tolist(), b_codes[first].tolist()):
+            findings.append((('RT', min(a, b), max(a, b)), {
+                "ring_id": f"RT_{self._account_id(a)[-4:]}_{self._account_id(b)[-4:]}",
+                "pattern_type": "Round-Trip Layering",
+                "member_count": 2,
+                "nodes": [a, b],
+                "score": FraudConfig.ROUND_TRIP_POINTS * 2
+            }, [([a, b], FraudConfig.ROUND_TRIP_POINTS, 'ROUND_TRIP')]))
+        return {"findings": findings}
 
     def run_analysis(self):
-        self.detect_geo_risk()
-        self.detect_smurfing()
-        self.detect_cycles()
-        self.detect_velocity_burst()
-        self.detect_round_trips()
+        inputs = self._detector_inputs(DETECTORS)
+        self._run_detectors([(name, {k: inputs[k] for k in spec["inputs"]}) for name, spec in DETECTORS.items()])
         self.fraud_rings.sort(key=lambda x: x['score'], reverse=True)
-        return self.generate_ui_payload()
+        with self.timings.stage('ui_payload'):
+            return self.generate_ui_payload()
 
-    def generate_ui_payload(self):
-        G = nx.from_pandas_edgelist(self.df, 'sender_id', 'receiver_id', ['amount', 'timestamp'], create_using=nx.DiGraph())
-        nodes_to_render = set(self.suspicious_nodes)
-        if not nodes_to_render:
-            nodes_to_render = set(list(G.nodes())[:100])
-        else:
-            neighbors = set()
-            for n in nodes_to_render:
-                neighbors.update(G.successors(n))
-                neighbors.update(G.predecessors(n))
-            nodes_to_render.update(neighbors)
+    # ── Incremental append ──────────────────────────────────────────────────
+    def append(self, df: pd.DataFrame) -> dict:
+        """Fold new ledger rows into an analysed scan and rescore only what they touch.
+
+        Each detector's rescope hook picks the findings the new rows can change
+        (smurf hubs, velocity senders, round-trip pairs, cycles through touched
+        pairs) and narrows its inputs to them; those findings are retracted and
+        the detectors re-run on the narrowed inputs. Returns the appended
+        counts, the accounts whose findings changed and refreshed analytics.
 
-        nodes_to_render = set(list(nodes_to_render)[:FraudConfig.MAX_NODES_TO_RENDER])
-        subgraph = G.subgraph(nodes_to_render)
+        The grown ledger, pair table, account table and cycle graph are built
+        on copies and swapped in together; should rescoring then fail, the
+        engine is put back as it was, so a failed append leaves the scan intact.
+        """
+        self.timings = timings = Timings()
+        timings.count('rows_in', len(df))
+        with timings.stage('clean'):
+            df = self._universal_data_cleaner(df)
 
+        # ── Stage the grown scan ──────────────────────────────────────────
+        acc = self._acc.copy()
+        with timings.stage('encode_accounts'):
+            compact = acc.add(df)
+        df['sender_code'] = compact['sender_code'].to_numpy()
+        df['receiver_code'] = compact['receiver_code'].to_numpy()
+        new_ids = acc.encoder.ids(len(self.accounts))
+        accounts = self.accounts.grown(new_ids, hash_countries(
+            new_ids, len(FraudConfig.HIGH_RISK_COUNTRIES), len(FraudConfig.STANDARD_COUNTRIES)))
+        accounts.sent[:] = acc.sent
+        accounts.received[:] = acc.received
+        if accounts.label_hits is None:
+            accounts.track_labels(a for _, _, assigns in self._findings.values() for a in assigns)
+        with timings.stage('concat'):
+            ledger = pd.concat([self.df, df.reindex(columns=self.df.columns)], ignore_index=True)
+        with timings.stage('pair_table'):
+            pairs = acc.pair_table()
+        graphs = self._graphs
+        if graphs is not None:
+            with timings.stage('pair_graph'):
+                keys = np.unique(_pair_key(df))
+                s, r, count = keys >> 32, keys & 0xFFFFFFFF, pairs['count'].to_numpy(np.int64)[acc.pair_rows(keys)]
+                graphs = graphs[0].with_edges(len(accounts), s, r, count), graphs[1].with_edges(len(accounts), r, s, count)
+        timings.count('rows', len(df))
+        timings.count('new_accounts', len(new_ids))
+
+        # ── Swap it in and rescore ────────────────────────────────────────
+        saved = {name: getattr(self, name) for name in
+                 ('df', 'pairs', '_acc', 'accounts', '_graphs', '_node_store', '_findings', 'detector_stats', 'fraud_rings')}
+        self.df, self.pairs, self._acc, self.accounts, self._graphs, self._node_store = ledger, pairs, acc, accounts, graphs, None
+        self._findings, self.detector_stats, self.fraud_rings = dict(self._findings), dict(self.detector_stats), list(self.fraud_rings)
+        self._changed = []
         try:
+            if not df.empty:
+                inputs, jobs = self._detector_inputs(DETECTORS), []
+                for name, spec in DETECTORS.items():
+                    if spec["rescope"] is None:
+                        keys = [key for key, (owner, _, _) in self._findings.items() if owner == name]
+                        scoped = keys, {k: inputs[k] for k in spec["inputs"]}
+                    else:
+                        with timings.stage(f'rescope.{name}'):
+                            scoped = spec["rescope"](self, df, inputs)
+                    if scoped is None:
+                        continue
+                    for key in scoped[0]:
+                        self._retract(key)
+                    jobs.append((name, scoped[1]))
+                self._run_detectors(jobs)
+            changed = np.unique(np.concatenate(self._changed)) if self._changed else np.zeros(0, dtype=np.int64)
+        except BaseException:
+            self.__dict__.update(saved)
+            raise
+        finally:
+            self._changed = None
+        self.fraud_rings = sorted((ring for _, ring, _ in self._findings.values()), key=lambda x: x['score'], reverse=True)
+
+        freeze_mask = accounts.suspicious & (accounts.scores >= FraudConfig.FREEZE_THRESHOLD_SCORE)
+        updated = [self._entity(node, accounts.scores, freeze_mask) for node in changed.tolist()]
+        updated.sort(key=lambda x: x['risk_score'], reverse=True)
+        return {
+            "rows_appended": len(df),
+            "new_accounts": len(new_ids),
+            "updated_accounts": updated,
+            "analytics": {
+                "total_transactions": len(self.df),
+                "flagged_entities": int(np.count_nonzero(accounts.suspicious)),
+                "freeze_recommendations": int(np.count_nonzero(freeze_mask)),
+                "max_risk_score": int(accounts.scores.max()) if len(accounts) else 0,
+                "fraud_pattern_count": len(self.fraud_rings),
+                "cycle_search_truncated": self.cycle_search["truncated"],
+            },
+        }
+
+    def _timeline(self, suspicious: np.ndarray, granularity: str | None = None) -> list[dict]:
+        """Volume, count and flagged-transaction count per hour/day/week bucket that has activity."""
+        granularity = granularity or FraudConfig.TIMELINE_GRANULARITY
+        if granularity not in TIMELINE_BUCKETS:
+            raise ValueError(f"Unknown timeline granularity: {granularity!r}")
+        if self.df.empty:
+            return []
+        size, offset, unit = TIMELINE_BUCKETS[granularity]
+        bucket = (to_epoch_seconds(self.df['timestamp']) - offset) // size
+        first = bucket.min()
+        bucket -= first
+        flagged = suspicious[self.df['sender_code'].values] | suspicious[self.df['receiver_code'].values]
+
+        count = np.bincount(bucket)
+        volume = np.bincount(bucket, weights=self.df['amount'].to_numpy(np.float64))
+        flagged = np.bincount(bucket, weights=flagged)
+        active = np.flatnonzero(count)
+        starts = ((active + first) * size + offset).astype('datetime64[s]')
+        labels = np.datetime_as_string(starts, unit=unit)
+        if unit == 'h':
+            labels = np.char.add(np.char.replace(labels, 'T', ' '), ':00')
+        return [
+            {"date": date, "volume": round(vol, 2), "count": n, "flagged": int(f)}
+            for date, vol, n, f in zip(labels.tolist(), volume[active].tolist(), count[active].tolist(), flagged[active].tolist())
+        ]
+
+    def _select_render_nodes(self) -> list[int]:
+        """Codes to render, best first: flagged accounts by risk, then their heaviest counterparties.
+
+        Each flagged account pulls in at most RENDER_NEIGHBOR_CAP counterparties
+        (its largest flows), so one touching an exchange can't flood the view.
+        The top MAX_NODES_TO_RENDER come off a bounded heap, ties broken by code.
+        """
+        accounts, limit = self.accounts, FraudConfig.MAX_NODES_TO_RENDER
+        suspicious = accounts.suspicious
+        if not suspicious.any():
+            volume = accounts.sent + accounts.received
+            return np.lexsort((np.arange(len(accounts)), -volume))[:min(limit, 100)].tolist()
+
+        s = self.pairs['sender_code'].to_numpy(np.int64)
+        r = self.pairs['receiver_code'].to_numpy(np.int64)
+        w = self.pairs['amount_sum'].to_numpy(np.float64)
+        hub, other, weight = np.concatenate([s, r]), np.concatenate([r, s]), np.concatenate([w, w])
+        keep = suspicious[hub] & (hub != other)
+        order = np.lexsort((other[keep], -weight[keep], hub[keep]))
+        hub, other, weight = hub[keep][order], other[keep][order], weight[keep][order]
+        capped = np.arange(len(hub)) - np.searchsorted(hub, hub) < FraudConfig.RENDER_NEIGHBOR_CAP
+        link = np.bincount(other[capped], weights=weight[capped], minlength=len(accounts))
+        reached = np.bincount(other[capped], minlength=len(accounts)) > 0
+
+        candidates = np.flatnonzero(suspicious | reached).tolist()
+        flagged, scores, link = suspicious.tolist(), accounts.scores.tolist(), link.tolist()
+        return heapq.nlargest(limit, candidates, key=lambda n: (flagged[n], scores[n], link[n], -n))
+
+    def _centrality(self, subgraph: nx.DiGraph) -> dict:
+        """Betweenness (or its proxy) per node, cached by mode and subgraph fingerprint."""
+        mode, k, seed = FraudConfig.CENTRALITY_MODE, FraudConfig.CENTRALITY_SAMPLE_K, FraudConfig.CENTRALITY_SEED
+        nodes = np.sort(np.fromiter(subgraph.nodes, dtype=np.int64, count=len(subgraph)))
+        edges = np.sort(np.fromiter((u << 32 | v for u, v in subgraph.edges), dtype=np.int64, count=subgraph.number_of_edges()))
+        key = (mode, k, seed, hashlib.blake2b(nodes.tobytes() + b'|' + edges.tobytes(), digest_size=16).hexdigest())
+        if key in self._centrality_cache:
+            return self._centrality_cache[key]
+
+        if mode == 'degree':
+            # Only nodes with both inflow and outflow can sit between others
+            centrality = {n: subgraph.in_degree(n) * subgraph.out_degree(n) for n in subgraph}
+        elif mode == 'sampled' and k < len(subgraph):
+            centrality = nx.betweenness_centrality(subgraph, k=k, seed=seed)
+        elif mode in ('exact', 'sampled'):
             centrality = nx.betweenness_centrality(subgraph)
+        else:
+            raise ValueError(f"Unknown CENTRALITY_MODE: {mode!r}")
+        self._centrality_cache[key] = centrality
+        return centrality
+
+    def _entity(self, node: int, scores: np.ndarray, freeze_mask: np.ndarray) -> dict:
+        """Flagged-entity row for one account (the CSV export shape)."""
+        accounts = self.accounts
+        return {
+            "account_id": str(accounts.ids[node]),
+            "risk_score": int(scores[node]),
+            "country": accounts.country_of(node),
+            "fraud_types": "|".join(accounts.label_names(node)),
+            "total_sent": round(float(accounts.sent[node]), 2),
+            "total_received": round(float(accounts.received[node]), 2),
+            "recommend_freeze": bool(freeze_mask[node])
+        }
+
+    def generate_ui_payload(self):
+        accounts = self.accounts
+        scores = accounts.scores.copy()   # SHADOW_BOSS bonus is display-only; append() keeps rescoring the table
+        suspicious = accounts.suspicious
+        suspicious_codes = np.flatnonzero(suspicious)
+
+        render = self._select_render_nodes()
+        nodes_to_render = set(render)
+        in_render = np.zeros(len(accounts), dtype=bool)
+        in_render[render] = True
+        render_pairs = self.pairs[in_render[self.pairs['sender_code'].values] & in_render[self.pairs['receiver_code'].values]]
+        subgraph = nx.from_pandas_edgelist(render_pairs, 'sender_code', 'receiver_code', ['last_amount', 'last_timestamp'], create_using=nx.DiGraph())
+        subgraph.add_nodes_from(render)
+
+        self.timings.count('render_nodes', len(render))
+        self.timings.count('render_edges', subgraph.number_of_edges())
+        try:
+            with self.timings.stage('ui_payload.centrality'):
+                centrality = self._centrality(subgraph)
             threshold = sorted(centrality.values(), reverse=True)[:max(1, len(centrality)//33)][-1] if centrality else 1.0
         except Exception:
             centrality, threshold = {}, 1.0
 
-        history = {n: [] for n in nodes_to_render}
-        totals = {n: {'sent': 0.0, 'received': 0.0} for n in nodes_to_render}
-        node_metadata = {n: {} for n in nodes_to_render}
-        core_fields = ['sender_id', 'receiver_id', 'amount', 'timestamp']
-        
-        for record in self.df.to_dict('records'):
-            s, r, amt, time = record['sender_id'], record['receiver_id'], record['amount'], str(record['timestamp'])
-            metadata = {str(k).upper(): str(v) for k, v in record.items() if k not in core_fields and pd.notna(v)}
-            if s in nodes_to_render:
-                totals[s]['sent'] += amt
-                node_metadata[s].update(metadata)
-                if len(history[s]) < 30: history[s].append({'type': 'SENT', 'counterparty': str(r), 'amount': amt, 'time': time})
-            if r in nodes_to_render:
-                totals[r]['received'] += amt
-                node_metadata[r].update(metadata)
-                if len(history[r]) < 30: history[r].append({'type': 'RECEIVED', 'counterparty': str(s), 'amount': amt, 'time': time})
-
-        accounts_to_freeze = [n for n in self.suspicious_nodes if self.points.get(n, 0) >= FraudConfig.FREEZE_THRESHOLD_SCORE]
-        
+        details = self.node_store.details(render) if FraudConfig.INLINE_NODE_DETAILS else {}
+        ids = accounts.ids
+
+        freeze_mask = suspicious & (scores >= FraudConfig.FREEZE_THRESHOLD_SCORE)
+        n_freeze = int(np.count_nonzero(freeze_mask))
+
         graph_data = []
-        for node in nodes_to_render:
-            labels = list(self.node_labels.get(node, []))
+        for node in render:
+            labels = accounts.label_names(node)
             primary_label = labels[0] if labels else 'NORMAL'
             is_shadow_boss = centrality.get(node, 0) >= threshold and centrality.get(node, 0) > 0
             if is_shadow_boss:
                 primary_label = 'SHADOW_BOSS'
-                self.points[node] += 30 
-            
-            recommend_freeze = node in accounts_to_freeze or is_shadow_boss
-            country = self.node_countries.get(node, 'IN')
+                scores[node] += 30
+
+            recommend_freeze = bool(freeze_mask[node]) or is_shadow_boss
+            country = accounts.country_of(node)
+            account_id = str(ids[node])
             graph_data.append({
                 "data": {
-                    "id": str(node), "label": f"{'🛑 ' if recommend_freeze else ''}{node}\n[{country}]", "country": country,
-                    "is_suspicious": node in self.suspicious_nodes or is_shadow_boss, "fraud_type": primary_label,
-                    "risk_score": self.points.get(node, 0), "total_sent": totals[node]['sent'],
-                    "total_received": totals[node]['received'], "history": history[node], 
-                    "metadata": node_metadata[node], "recommend_freeze": recommend_freeze
+                    "id": account_id, "label": f"{'🛑 ' if recommend_freeze else ''}{account_id}\n[{country}]", "country": country,
+                    "is_suspicious": bool(suspicious[node]) or is_shadow_boss, "fraud_type": primary_label,
+                    "risk_score": int(scores[node]), "total_sent": float(accounts.sent[node]),
+                    "total_received": float(accounts.received[node]), "recommend_freeze": recommend_freeze,
+                    **details.get(node, {})
                 }
             })
-            
+
         for u, v, data in subgraph.edges(data=True):
             graph_data.append({
                 "data": {
-                    "source": str(u), "target": str(v), "amount": f"{data.get('amount', 0):.2f}",
-                    "timestamp": str(data.get('timestamp', '')), "is_fraudulent": (u in self.suspicious_nodes and v in self.suspicious_nodes)
+                    "source": str(ids[u]), "target": str(ids[v]), "amount": f"{data.get('last_amount', 0):.2f}",
+                    "amount_value": float(data.get('last_amount', 0)),   # unrounded, for the columnar encoding
+                    "timestamp": str(data.get('last_timestamp', '')), "is_fraudulent": bool(suspicious[u] and suspicious[v])
                 }
             })
 
         # ── Network-level statistics ──────────────────────────────────────────
-        all_scores = list(self.points.values())
-        avg_risk = float(np.mean(all_scores)) if all_scores else 0.0
+        avg_risk = float(np.mean(scores)) if len(scores) else 0.0
         try:
             density = float(nx.density(subgraph))
         except Exception:
             density = 0.0
         try:
-            ug = subgraph.to_undirected()
-            cc = float(nx.average_clustering(ug)) if len(ug) > 1 else 0.0
+            with self.timings.stage('ui_payload.clustering'):
+                ug = subgraph.to_undirected()
+                cc = float(nx.average_clustering(ug)) if len(ug) > 1 else 0.0
         except Exception:
             cc = 0.0
 
-        # ── Daily timeline (for sparkline chart) ─────────────────────────────
-        self.df['date_str'] = self.df['timestamp'].dt.strftime('%Y-%m-%d')
-        daily = self.df.groupby('date_str').agg(
-            volume=('amount', 'sum'),
-            count=('amount', 'count')
-        ).reset_index()
-        # Mark days with flagged activity
-        flagged_ids = self.suspicious_nodes
-        flagged_mask = self.df['sender_id'].isin(flagged_ids) | self.df['receiver_id'].isin(flagged_ids)
-        flagged_daily = self.df[flagged_mask].groupby('date_str').size().reset_index(name='flagged')
-        daily = daily.merge(flagged_daily, on='date_str', how='left').fillna(0)
-        timeline = [
-            {"date": row['date_str'], "volume": round(row['volume'], 2), "count": int(row['count']), "flagged": int(row['flagged'])}
-            for _, row in daily.iterrows()
-        ]
+        # ── Activity timeline (for sparkline chart) ──────────────────────────
+        timeline = self._timeline(suspicious)
 
         # ── Fraud type breakdown ──────────────────────────────────────────────
-        fraud_type_counts: dict[str, int] = {}
-        for node in self.suspicious_nodes:
-            for label in self.node_labels.get(node, []):
-                fraud_type_counts[label] = fraud_type_counts.get(label, 0) + 1
+        fraud_type_counts = accounts.label_counts(suspicious_codes)
 
         # ── Flagged entities list (for CSV export) ────────────────────────────
-        flagged_entities = []
-        for node in nodes_to_render:
-            if node in self.suspicious_nodes or node in accounts_to_freeze:
-                flagged_entities.append({
-                    "account_id": str(node),
-                    "risk_score": self.points.get(node, 0),
-                    "country": self.node_countries.get(node, 'IN'),
-                    "fraud_types": "|".join(self.node_labels.get(node, [])),
-                    "total_sent": round(totals[node]['sent'], 2),
-                    "total_received": round(totals[node]['received'], 2),
-                    "recommend_freeze": node in accounts_to_freeze
-                })
+        flagged_entities = [self._entity(node, scores, freeze_mask) for node in render if suspicious[node]]
         flagged_entities.sort(key=lambda x: x['risk_score'], reverse=True)
 
-        accounts_to_freeze_list = [
-            {"account_id": str(n), "risk_score": self.points.get(n, 0),
-             "country": self.node_countries.get(n, 'IN'),
-             "fraud_types": "|".join(self.node_labels.get(n, []))}
-            for n in accounts_to_freeze
+        fraud_rings = [
+            {**ring, "nodes": [str(ids[n]) for n in ring["nodes"]]}
+            for ring in self.fraud_rings[:25]
         ]
 
         return {
             "analytics": {
                 "total_transactions": len(self.df),
-                "flagged_entities": len(self.suspicious_nodes),
-                "freeze_recommendations": len(accounts_to_freeze),
-                "max_risk_score": max(self.points.values()) if self.points else 0,
+                "flagged_entities": len(suspicious_codes),
+                "freeze_recommendations": n_freeze,
+                "max_risk_score": int(scores.max()) if len(scores) else 0,
                 "avg_risk_score": round(avg_risk, 1),
                 "network_density": round(density, 4),
                 "clustering_coefficient": round(cc, 4),
                 "fraud_pattern_count": len(self.fraud_rings),
+                "cycle_search_truncated": self.cycle_search["truncated"],
             },
             "graph_data": graph_data,
-            "fraud_rings": self.fraud_rings[:25],
+            "fraud_rings": fraud_rings,
             "timeline": timeline,
             "fraud_type_breakdown": fraud_type_counts,
             "flagged_entities": flagged_entities,
-        }
\ No newline at end of file
+        }
@@ -0,0 +1,384 @@
+import copy
+import io
+import os
+import re
+
+import numpy as np
+import pandas as pd
+from pandas.api.types import is_bool_dtype, is_datetime64_any_dtype, is_numeric_dtype
+from pandas.tseries.api import guess_datetime_format
+
+from account_table import AccountEncoder
+
+try:
+    import pyarrow as pa
+    import pyarrow.csv as pa_csv
+    import pyarrow.parquet as pq
+    PYARROW_AVAILABLE = True
+except ImportError:
+    PYARROW_AVAILABLE = False
+
+# Header keyword -> logical column, checked in order (first match wins).
+COLUMN_PATTERNS = [
+    (re.compile(r'sender|source|from|origin|payer'), 'sender_id'),
+    (re.compile(r'receiver|target|to|dest|beneficiary|payee'), 'receiver_id'),
+    (re.compile(r'amount|value|amt|total|price'), 'amount'),
+    (re.compile(r'time|date|created'), 'timestamp'),
+    (re.compile(r'id|txid|reference|hash'), 'transaction_id'),
+]
+CORE_COLUMNS = ('sender_id', 'receiver_id', 'amount', 'timestamp')
+TIMESTAMP_SAMPLE_SIZE = 64
+BUFFER_TYPES = (bytes, bytearray, memoryview)   # in-memory uploads; Arrow reads them in place
+SCHEMA_CACHE_MAX_ENTRIES = 256
+STREAM_PROBE_ROWS = 10_000
+CLEANER_WORKING_COPIES = 4    # raw chunk + copies alive inside the cleaner
+PAIR_FOLD_EVERY = 8           # partial pair aggregates kept before re-reducing
+
+# ── Schema cache ────────────────────────────────────────────────────────
+# Header signature (normalized column names) -> {"mapping", "ts_format"}.
+# Vendor files keep the same layout day to day, so after the first upload
+# both header matching and timestamp format detection are dict lookups.
+_schema_cache: dict[tuple[str, ...], dict] = {}
+
+
+def infer_schema(columns) -> dict:
+    signature = tuple(columns)
+    schema = _schema_cache.get(signature)
+    if schema is None:
+        mapping = {}
+        for col in signature:
+            for pattern, logical in COLUMN_PATTERNS:
+                if pattern.search(col):
+                    mapping[col] = logical
+                    break
+        schema = {"mapping": mapping, "ts_format": None}
+        if len(_schema_cache) >= SCHEMA_CACHE_MAX_ENTRIES:
+            _schema_cache.pop(next(iter(_schema_cache)))
+        _schema_cache[signature] = schema
+    return schema
+
+
+def parse_amount(col: pd.Series) -> pd.Series:
+    """Amounts as float64; numeric columns skip the string scrub entirely."""
+    if is_numeric_dtype(col) and not is_bool_dtype(col):
+        values = col.to_numpy(dtype=np.float64, na_value=np.nan)
+        return pd.Series(values, index=col.index).fillna(0.0)
+    scrubbed = col.astype(str).str.replace(r'[^\d\.-]', '', regex=True)
+    return pd.to_numeric(scrubbed, errors='coerce').fillna(0.0)
+
+
+def _detect_timestamp_format(sample: pd.Series) -> str | None:
+    if sample.empty:
+        return None
+    fmt = guess_datetime_format(sample.iloc[0])
+    if fmt is None or pd.to_datetime(sample, format=fmt, errors='coerce', utc=True).isna().any():
+        return None
+    return fmt
+
+
+def parse_timestamp(col: pd.Series, schema: dict) -> pd.Series:
+    """Parse with the layout's cached format (detected once from a sample) into naive UTC.
+
+    Timezone-aware values are converted to UTC and the zone dropped; naive
+    ones are taken as UTC already. Every upload so yields the same dtype,
+    and a scan built from one file can take appends from another.
+    """
+    if is_datetime64_any_dtype(col):
+        return col.dt.tz_convert(None) if isinstance(col.dtype, pd.DatetimeTZDtype) else col
+    if is_numeric_dtype(col):
+        return pd.to_datetime(col, errors='coerce')
+
+    sample = col.dropna().head(TIMESTAMP_SAMPLE_SIZE).astype(str)
+    fmt = schema["ts_format"]
+    if fmt is not None and pd.to_datetime(sample, format=fmt, errors='coerce', utc=True).isna().any():
+        fmt = None  # layout reused with a different date format
+    if fmt is None:
+        fmt = schema["ts_format"] = _detect_timestamp_format(sample)
+    if fmt is None:
+        return pd.to_datetime(col, errors='coerce', utc=True).dt.tz_convert(None)
+    return pd.to_datetime(col, format=fmt, errors='coerce', utc=True).dt.tz_convert(None)
+
+
+def to_epoch_seconds(col: pd.Series) -> np.ndarray:
+    """int64 Unix seconds, independent of the column's datetime unit or timezone."""
+    return col.to_numpy(dtype='datetime64[s]').astype(np.int64)
+
+
+def normalize_headers(columns) -> pd.Index:
+    return pd.Index(columns).astype(str).str.strip().str.lower()
+
+
+# ── CSV parser backends ─────────────────────────────────────────────────
+_ARROW_TYPE_HINTS = {
+    'sender_id': 'string', 'receiver_id': 'string', 'amount': 'float64', 'timestamp': 'timestamp',
+}
+
+
+def _arrow_csv_types(header, typed: bool) -> dict:
+    mapping = infer_schema(normalize_headers(header))["mapping"]
+    hints = {}
+    for raw, norm in zip(header, normalize_headers(header)):
+        hint = _ARROW_TYPE_HINTS.get(mapping.get(norm))
+        if hint == 'string':
+            hints[raw] = pa.string()
+        elif typed and hint == 'float64':
+            hints[raw] = pa.float64()
+        elif typed and hint == 'timestamp':
+            hints[raw] = pa.timestamp('us')
+    return hints
+
+
+def _read_csv_arrow(source) -> pd.DataFrame:
+    header = pd.read_csv(pa.BufferReader(source) if isinstance(source, BUFFER_TYPES) else source, nrows=0).columns
+    read_options = pa_csv.ReadOptions(use_threads=True)
+    # Typed amount/timestamp first; vendor files with currency symbols or
+    # non-ISO dates fail that conversion and are re-read as strings.
+    for typed in (True, False):
+        convert_options = pa_csv.ConvertOptions(column_types=_arrow_csv_types(header, typed), strings_can_be_null=True)
+        try:
+            table = pa_csv.read_csv(pa.BufferReader(source) if isinstance(source, BUFFER_TYPES) else source,
+                                    read_options=read_options, convert_options=convert_options)
+            break
+        except pa.ArrowInvalid:
+            if not typed:
+                raise
+    return table.to_pandas(split_blocks=True, self_destruct=True)
+
+
+def read_csv(source, backend: str = 'auto') -> pd.DataFrame:
+    """Parse a whole CSV (bytes, a buffer such as a memoryview, or path) with the configured backend.
+
+    'pyarrow' uses Arrow's multithreaded columnar reader with type hints for
+    the core columns; 'auto' picks it when pyarrow is installed and falls
+    back to the pandas C parser otherwise.
+    """
+    if backend == 'pyarrow' and not PYARROW_AVAILABLE:
+        raise ValueError("CSV parser backend 'pyarrow' requires the optional 'pyarrow' package")
+    if backend in ('pyarrow', 'auto') and PYARROW_AVAILABLE:
+        return _read_csv_arrow(source)
+    header = pd.read_csv(io.BytesIO(source) if isinstance(source, BUFFER_TYPES) else source, nrows=0).columns
+    return pd.read_csv(io.BytesIO(source) if isinstance(source, BUFFER_TYPES) else source, dtype=_id_dtypes(header))
+
+
+# ── Columnar uploads (Parquet / Arrow IPC) ──────────────────────────────
+def sniff_format(raw: bytes) -> str:
+    """'parquet', 'arrow_file', 'arrow_stream' or 'csv', from the leading magic bytes."""
+    if raw[:4] == b'PAR1':
+        return 'parquet'
+    if raw[:6] == b'ARROW1':
+        return 'arrow_file'
+    if raw[:4] == b'\xff\xff\xff\xff':
+        return 'arrow_stream'
+    return 'csv'
+
+
+def read_columnar(raw: bytes, fmt: str) -> pd.DataFrame:
+    """Load only the columns that map to a logical field from a Parquet/Arrow upload.
+
+    Buffers are read in place from the upload bytes; typed numeric and
+    timestamp columns reach the cleaner as-is and skip string parsing.
+    """
+    if not PYARROW_AVAILABLE:
+        raise ValueError("Parquet/Arrow uploads require the optional 'pyarrow' package")
+    buf = pa.BufferReader(raw)
+    if fmt == 'parquet':
+        names = pq.read_schema(buf).names
+        mapping = infer_schema(normalize_headers(names))["mapping"]
+        table = pq.read_table(pa.BufferReader(raw), columns=[n for n, norm in zip(names, normalize_headers(names)) if norm in mapping])
+    else:
+        reader = pa.ipc.open_file(buf) if fmt == 'arrow_file' else pa.ipc.open_stream(buf)
+        names = reader.schema.names
+        mapping = infer_schema(normalize_headers(names))["mapping"]
+        table = reader.read_all().select([n for n, norm in zip(names, normalize_headers(names)) if norm in mapping])
+
+    # Decimal amounts would otherwise come through as Python Decimal objects
+    for i, field in enumerate(table.schema):
+        if pa.types.is_decimal(field.type):
+            table = table.set_column(i, field.name, table.column(i).cast(pa.float64()))
+    return table.to_pandas(split_blocks=True, self_destruct=True)
+
+
+def read_upload(raw: bytes, backend: str = 'auto') -> pd.DataFrame:
+    """Uploaded Parquet, Arrow IPC or CSV bytes (sniffed by magic bytes) as one DataFrame."""
+    fmt = sniff_format(raw)
+    return read_csv(raw, backend) if fmt == 'csv' else read_columnar(raw, fmt)
+
+
+# ── Chunked CSV streaming ───────────────────────────────────────────────
+def _id_dtypes(header) -> dict:
+    """read_csv dtypes keeping account ids as written ('0012' stays '0012', and a blank doesn't turn 1000 into '1000.0')."""
+    mapping = infer_schema(normalize_headers(header))["mapping"]
+    return {raw: str for raw, norm in zip(header, normalize_headers(header)) if mapping.get(norm) in ('sender_id', 'receiver_id')}
+
+
+def _core_columns(source) -> tuple[list | None, dict | type]:
+    """Raw header names that map to a core column, and the dtypes for reading them.
+
+    Without a rewindable source the header can't be read ahead: every column
+    is read then, as strings so that chunks agree on account ids.
+    """
+    rewindable = hasattr(source, 'seek') and source.seekable()
+    if not (rewindable or isinstance(source, (str, os.PathLike))):
+        return None, str
+    header = pd.read_csv(source, nrows=0).columns
+    if rewindable:
+        source.seek(0)
+    mapping = infer_schema(normalize_headers(header))["mapping"]
+    return [raw for raw, norm in zip(header, normalize_headers(header)) if mapping.get(norm) in CORE_COLUMNS], _id_dtypes(header)
+
+
+def iter_csv_chunks(source, memory_budget_bytes: int):
+    """Yield raw CSV chunks sized so cleaning one chunk stays inside the memory budget.
+
+    A probe chunk measures the parsed bytes per row; every later chunk is sized
+    from that. Only columns mapping to a core field are parsed when the source
+    can be rewound to read its header first. Account ids are read as strings,
+    so every chunk encodes them the way a whole-file read does.
+    """
+    usecols, dtype = _core_columns(source)
+    reader = pd.read_csv(source, usecols=usecols, dtype=dtype, chunksize=STREAM_PROBE_ROWS)
+    with reader:
+        try:
+            probe = reader.get_chunk(STREAM_PROBE_ROWS)
+        except StopIteration:
+            return
+        yield probe
+        row_bytes = probe.memory_usage(deep=True).sum() / max(len(probe), 1) * CLEANER_WORKING_COPIES
+        chunk_rows = max(STREAM_PROBE_ROWS, int(memory_budget_bytes // max(row_bytes, 1)))
+        while True:
+            try:
+                yield reader.get_chunk(chunk_rows)
+            except StopIteration:
+                return
+
+
+class EdgeAccumulator:
+    """Folds cleaned ledger chunks into per-account and per-pair aggregates.
+
+    Each chunk is encoded to account codes and reduced to compact columns.
+    Per-chunk pair aggregates are merged into one pair table every
+    PAIR_FOLD_EVERY chunks and whenever the table is read; the merge finds
+    the pending pairs through a sorted key index, so it costs the pending
+    pairs and one copy of the table's columns, not a regroup of every pair.
+    Folding never writes to an array or table it has handed out, so a
+    copy() can take chunks while the original stays as it was.
+    """
+
+    def __init__(self):
+        self.encoder = AccountEncoder()
+        self.sent = np.zeros(0, dtype=np.float64)
+        self.received = np.zeros(0, dtype=np.float64)
+        self._table: pd.DataFrame | None = None
+        self._pending: list[pd.DataFrame] = []
+        self._sorted: tuple[np.ndarray, np.ndarray] | None = None   # (sorted pair keys, their table rows), built on demand
+
+    def __getstate__(self) -> dict:
+        return {**self.__dict__, "_sorted": None}   # rebuilt on demand
+
+    def copy(self) -> 'EdgeAccumulator':
+        other = copy.copy(self)   # goes through __getstate__, so the index is carried over by hand
+        other.encoder = self.encoder.copy()
+        other._pending = list(self._pending)
+        other._sorted = self._sorted
+        return other
+
+    def add(self, chunk: pd.DataFrame) -> pd.DataFrame:
+        """Fold a cleaned chunk; returns its compact (codes, amount, timestamp) frame."""
+        s_codes, r_codes = self.encoder.encode(chunk['sender_id'], chunk['receiver_id'])
+        compact = pd.DataFrame({
+            'sender_code': s_codes,
+            'receiver_code': r_codes,
+            'amount': chunk['amount'].to_numpy(),
+            'timestamp': chunk['timestamp'].array,
+        })
+        n = len(self.encoder)
+        amounts = compact['amount'].to_numpy()
+        self.sent = self._grow(self.sent, n) + np.bincount(s_codes, weights=amounts, minlength=n)
+        self.received = self._grow(self.received, n) + np.bincount(r_codes, weights=amounts, minlength=n)
+
+        self._pending.append(self._reduce_pairs(compact, first_pass=True))
+        if len(self._pending) >= PAIR_FOLD_EVERY:
+            self._fold()
+        return compact
+
+    def pair_table(self) -> pd.DataFrame:
+        """One row per (sender_code, receiver_code) in first-seen order: count,
+        amount sum/min/max, first/last timestamp and the last transfer's amount/time."""
+        if self._pending:
+            self._fold()
+        return self._table
+
+    def pair_rows(self, keys: np.ndarray) -> np.ndarray:
+        """Pair table rows of (sender << 32 | receiver) keys, all of which must be in the table."""
+        self.pair_table()
+        sorted_keys, sorted_rows = self._sorted_index()
+        return sorted_rows[np.searchsorted(sorted_keys, keys)]
+
+    def _sorted_index(self) -> tuple[np.ndarray, np.ndarray]:
+        if self._sorted is None:
+            keys = _pair_keys(self._table)
+            rows = np.argsort(keys, kind='stable')
+            self._sorted = keys[rows], rows
+        return self._sorted
+
+    def _fold(self):
+        """Merge the pending pair aggregates into the table."""
+        delta = self._pending[0] if len(self._pending) == 1 else self._reduce_pairs(pd.concat(self._pending, ignore_index=True))
+        self._pending = []
+        if self._table is None:
+            self._table = delta
+            return
+        sorted_keys, sorted_rows = self._sorted_index()
+
+        keys = _pair_keys(delta)
+        pos = np.searchsorted(sorted_keys, keys)
+        seen = pos < len(sorted_keys)
+        seen[seen] = sorted_keys[pos[seen]] == keys[seen]
+        rows, fresh = sorted_rows[pos[seen]], ~seen
+
+        # New pairs go last (they were seen last); pairs seen before are updated in the copied columns
+        table = {col: np.concatenate([self._table[col].to_numpy(), delta[col].to_numpy()[fresh]]) for col in self._table.columns}
+        upd = {col: delta[col].to_numpy()[seen] for col in delta.columns}
+        table['count'][rows] += upd['count']
+        table['amount_sum'][rows] += upd['amount_sum']
+        table['amount_min'][rows] = np.minimum(table['amount_min'][rows], upd['amount_min'])
+        table['amount_max'][rows] = np.maximum(table['amount_max'][rows], upd['amount_max'])
+        table['ts_min'][rows] = np.minimum(table['ts_min'][rows], upd['ts_min'])
+        table['ts_max'][rows] = np.maximum(table['ts_max'][rows], upd['ts_max'])
+        table['last_amount'][rows] = upd['last_amount']
+        table['last_timestamp'][rows] = upd['last_timestamp']
+
+        new_keys = keys[fresh]
+        order = np.argsort(new_keys, kind='stable')
+        at = np.searchsorted(sorted_keys, new_keys[order])
+        new_rows = len(self._table) + order   # k-th new pair is row len(table) + k
+        self._sorted = np.insert(sorted_keys, at, new_keys[order]), np.insert(sorted_rows, at, new_rows)
+        self._table = pd.DataFrame(table)
+
+    @staticmethod
+    def _grow(arr: np.ndarray, n: int) -> np.ndarray:
+        return np.concatenate([arr, np.zeros(n - len(arr), dtype=arr.dtype)]) if n > len(arr) else arr
+
+    @staticmethod
+    def _reduce_pairs(frame: pd.DataFrame, first_pass: bool = False) -> pd.DataFrame:
+        """Single groupby over (sender_code, receiver_code).
+
+        last_amount/last_timestamp follow row order (the edge shown in the
+        graph); ts_min/ts_max are the first and last transfer in time.
+        """
+        grouped = frame.groupby(['sender_code', 'receiver_code'], sort=False)
+        if first_pass:
+            agg = grouped.agg(count=('amount', 'size'), amount_sum=('amount', 'sum'),
+                              amount_min=('amount', 'min'), amount_max=('amount', 'max'),
+                              ts_min=('timestamp', 'min'), ts_max=('timestamp', 'max'),
+                              last_amount=('amount', 'last'), last_timestamp=('timestamp', 'last'))
+        else:
+            agg = grouped.agg(count=('count', 'sum'), amount_sum=('amount_sum', 'sum'),
+                              amount_min=('amount_min', 'min'), amount_max=('amount_max', 'max'),
+                              ts_min=('ts_min', 'min'), ts_max=('ts_max', 'max'),
+                              last_amount=('last_amount', 'last'), last_timestamp=('last_timestamp', 'last'))
+        return agg.reset_index()
+
+
+def _pair_keys(pairs: pd.DataFrame) -> np.ndarray:
+    return pairs['sender_code'].to_numpy(np.int64) << 32 | pairs['receiver_code'].to_numpy(np.int64)
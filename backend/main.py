@@ -4,16 +4,17 @@ import hashlib
 import asyncio
 import uuid
 import time
+import threading
 from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
 from typing import Any, Optional
 
-import pandas as pd
 import uvicorn
 import certifi
-from fastapi import FastAPI, UploadFile, File, HTTPException, Body
+from fastapi import FastAPI, UploadFile, File, HTTPException, Body, Header, Query
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.middleware.gzip import GZipMiddleware
-from fastapi.responses import StreamingResponse
+from fastapi.responses import Response, StreamingResponse
 from fastapi.staticfiles import StaticFiles
 from pymongo import MongoClient
 from dotenv import load_dotenv
@@ -24,12 +25,37 @@ try:
 except ImportError:
     GENAI_AVAILABLE = False
 
-from engine import FraudEngine
+from analysis_pool import AnalysisPool
+from engine import FraudEngine, FraudConfig
+from ingest import read_csv, read_upload
+from metrics import (DEPTH_BUCKETS, LATENCY_BUCKETS, PROMETHEUS_MEDIA_TYPE, SIZE_BUCKETS, Counter, Gauge, Histogram,
+                     Registry, Timings)
+from scan_store import ScanStore
+from payload import (COLUMNAR_MEDIA_TYPE, MSGPACK_AVAILABLE, MSGPACK_MEDIA_TYPE, NDJSON_MEDIA_TYPE, FastJSONResponse,
+                     encode_graph, iter_ndjson, negotiate_format, to_msgpack)
 from generate_data import generate_synthetic_data
 
 load_dotenv()
 
-app = FastAPI(title="Financial Crime Graph Engine", version="2.0")
+# ── Executors for CPU-bound graph analysis ──────────────────────────────
+# ANALYSIS_EXECUTOR=process moves analyses into pre-forked worker processes;
+# the thread pool then only waits on them (and still runs appends and chat).
+ANALYSIS_EXECUTOR = os.getenv("ANALYSIS_EXECUTOR", "thread")   # "thread" | "process"
+ANALYSIS_WORKERS = int(os.getenv("ANALYSIS_WORKERS", "4"))
+executor = ThreadPoolExecutor(max_workers=ANALYSIS_WORKERS)
+analysis_pool: Optional[AnalysisPool] = None
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Forked here rather than at import, so worker processes never start more workers
+    global analysis_pool
+    if ANALYSIS_EXECUTOR == "process":
+        analysis_pool = AnalysisPool(ANALYSIS_WORKERS)
+    yield
+    if analysis_pool is not None:
+        analysis_pool.shutdown()
+
+app = FastAPI(title="Financial Crime Graph Engine", version="2.0", lifespan=lifespan)
 
 # ── Middleware ──────────────────────────────────────────────────────────
 app.add_middleware(GZipMiddleware, minimum_size=1000)  # compress large payloads
@@ -41,13 +67,43 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# ── Thread pool for CPU-bound graph analysis ────────────────────────────
-executor = ThreadPoolExecutor(max_workers=4)
-
 # ── In-memory caches ────────────────────────────────────────────────────
-_result_cache: dict = {}   # file_hash → analysis result
+_result_cache: dict = {}   # scan_id (file hash) → {"data", "engine" (newest scans only), "lock", "ts"}
 _job_store: dict = {}      # job_id  → {"status", "result", "error", "started_at"}
 CACHE_TTL = 600            # seconds
+CACHE_MAX_ENGINES = 8      # newest scans that keep their engine (node details, appends); older ones keep the payload only
+NODE_BATCH_MAX = 5000      # account ids per batch node-detail lookup
+HASH_BLOCK_BYTES = 1 << 20  # read size when hashing an upload
+
+# ── Scan store ──────────────────────────────────────────────────────────
+# Analysed scans are also kept on disk (see ScanStore), so node details and
+# appends keep working after the cache above has let a scan go. An empty
+# SCAN_STORE_DIR turns the store off.
+SCAN_STORE_DIR = os.getenv("SCAN_STORE_DIR", "scan_store")
+SCAN_RETENTION_DAYS = float(os.getenv("SCAN_RETENTION_DAYS", "30"))
+scan_store = ScanStore(SCAN_STORE_DIR, SCAN_RETENTION_DAYS * 86400, parser_backend=FraudConfig.CSV_PARSER_BACKEND) if SCAN_STORE_DIR else None
+_store_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="scan-store")   # saves, one at a time
+_restore_lock = threading.Lock()
+
+# ── Metrics (Prometheus text at /api/metrics) ───────────────────────────
+registry = Registry()
+STAGE_SECONDS = Histogram(registry, "fraudgraph_stage_seconds", "Time per pipeline stage, detector and response encoding",
+                          LATENCY_BUCKETS, ("stage",))
+ROWS_TOTAL = Counter(registry, "fraudgraph_rows_total", "Ledger rows analysed or appended")
+CACHE_LOOKUPS = Counter(registry, "fraudgraph_cache_lookups_total", "Analysis cache lookups", ("result",))
+QUEUE_DEPTH = Histogram(registry, "fraudgraph_executor_queue_depth", "Executor jobs waiting or running when a job is submitted",
+                        DEPTH_BUCKETS)
+RESPONSE_BYTES = Histogram(registry, "fraudgraph_response_bytes", "Encoded analysis response size, before gzip",
+                           SIZE_BUCKETS, ("format",))
+_executor_jobs = 0         # submitted to the executor and not finished; only touched on the event loop
+
+def _cache_hit_ratio() -> float:
+    hits, misses = CACHE_LOOKUPS.value(result="hit"), CACHE_LOOKUPS.value(result="miss")
+    return hits / (hits + misses) if hits + misses else 0.0
+
+Gauge(registry, "fraudgraph_cache_hit_ratio", "Share of analysis cache lookups answered from the cache", _cache_hit_ratio)
+Gauge(registry, "fraudgraph_executor_jobs", "Executor jobs waiting or running", lambda: _executor_jobs)
+Gauge(registry, "fraudgraph_cache_entries", "Scans held in the result cache", lambda: len(_result_cache))
 
 # ── Gemini AI (optional) ────────────────────────────────────────────────
 GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
@@ -72,17 +128,135 @@ if MONGO_URI:
 
 
 # ── Helpers ─────────────────────────────────────────────────────────────
-def _hash_bytes(data: bytes) -> str:
-    return hashlib.md5(data).hexdigest()
+def _hash_file(f) -> tuple[str, int]:
+    """md5 and size of an uploaded file, read in blocks so the upload never has to fit in memory."""
+    f.seek(0)
+    digest, size = hashlib.md5(), 0
+    for block in iter(lambda: f.read(HASH_BLOCK_BYTES), b''):
+        digest.update(block)
+        size += len(block)
+    f.seek(0)
+    return digest.hexdigest(), size
 
 def _is_cache_fresh(entry: dict) -> bool:
     return time.time() - entry.get("ts", 0) < CACHE_TTL
 
-def _run_engine(csv_bytes: bytes) -> dict[str, Any]:
-    """CPU-bound work — runs in thread pool."""
-    df = pd.read_csv(io.BytesIO(csv_bytes))
-    engine = FraudEngine(df)
-    result: dict[str, Any] = engine.run_analysis()
+def _graph_format(fmt: Optional[str], accept: Optional[str]) -> str:
+    try:
+        fmt = negotiate_format(fmt, accept)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if fmt == "msgpack" and not MSGPACK_AVAILABLE:
+        raise HTTPException(status_code=406, detail="MessagePack output needs the msgpack package")
+    return fmt
+
+def _respond(body: dict[str, Any], fmt: str):
+    """Analysis response in the negotiated graph format (Cytoscape elements by default)."""
+    start = time.perf_counter()
+    body = encode_graph(body, fmt)
+    if fmt == "ndjson":
+        return StreamingResponse(_metered(iter_ndjson(body), fmt), media_type=NDJSON_MEDIA_TYPE)
+    if fmt == "msgpack":
+        response = Response(to_msgpack(body), media_type=MSGPACK_MEDIA_TYPE)
+    elif fmt == "columnar":
+        response = FastJSONResponse(body, media_type=COLUMNAR_MEDIA_TYPE)
+    else:
+        response = FastJSONResponse(body)
+    STAGE_SECONDS.observe(time.perf_counter() - start, stage="serialize")
+    RESPONSE_BYTES.observe(len(response.body), format=fmt)
+    return response
+
+def _metered(records, fmt: str):
+    size = 0
+    for record in records:
+        size += len(record)
+        yield record
+    RESPONSE_BYTES.observe(size, format=fmt)
+
+def _timings(engine: FraudEngine, wanted: bool) -> dict:
+    """The engine's stage timings and counters as a response field, when asked for with ?timings=true."""
+    return {"timings": engine.timings.as_dict()} if wanted else {}
+
+def _observe_run(timings: Timings):
+    for stage, seconds in timings.stages.items():
+        STAGE_SECONDS.observe(seconds, stage=stage)
+    ROWS_TOTAL.inc(timings.counts.get("rows", 0))
+
+async def _offload(fn, *args):
+    """Run fn on the executor, recording how many jobs were ahead of it."""
+    global _executor_jobs
+    QUEUE_DEPTH.observe(_executor_jobs)
+    _executor_jobs += 1
+    try:
+        return await asyncio.get_event_loop().run_in_executor(executor, fn, *args)
+    finally:
+        _executor_jobs -= 1
+
+def _cache_hit(scan_id: str) -> Optional[dict]:
+    """A reusable scan: cached or stored, not appended to since, and holding its engine (so its scan_id works)."""
+    entry = _result_cache.get(scan_id)
+    if entry and _is_cache_fresh(entry) and "engine" in entry:
+        return None if entry["appended"] else entry
+    restored = _restore_scan(scan_id, appended_ok=False)
+    return restored[0] if restored is not None else None
+
+def _cache_put(scan_id: str, result: dict[str, Any], engine: FraudEngine, appended: bool = False) -> dict:
+    """Cache a scan, dropping expired entries and the engines of all but the newest CACHE_MAX_ENGINES scans."""
+    for key in [key for key, entry in list(_result_cache.items()) if not _is_cache_fresh(entry)]:
+        del _result_cache[key]
+    entry = {"data": result, "engine": engine, "lock": threading.Lock(), "ts": time.time(), "appended": appended}
+    _result_cache[scan_id] = entry
+    with_engine = sorted((entry["ts"], key) for key, entry in list(_result_cache.items()) if "engine" in entry)
+    for _, key in with_engine[:-CACHE_MAX_ENGINES]:
+        del _result_cache[key]["engine"]
+    return entry
+
+def _store_scan(scan_id: str, entry: dict):
+    """Save a newly analysed scan in the background; under its lock, so appends in between are included."""
+    if scan_store is None:
+        return
+    engine = entry["engine"]
+
+    def save():
+        with entry["lock"]:
+            scan_store.save(scan_id, engine, entry["data"], entry["appended"])
+    _store_executor.submit(save)
+
+def _restore_scan(scan_id: str, appended_ok: bool = True) -> Optional[tuple[dict, FraudEngine]]:
+    """Load a scan the cache no longer holds from the store and cache it again; None if it isn't stored.
+
+    appended_ok=False skips scans that have been appended to (they no longer match their upload).
+    """
+    if scan_store is None or (not appended_ok and scan_store.appended(scan_id)):
+        return None
+    with _restore_lock:   # one load per scan, even when several requests miss at once
+        entry = _result_cache.get(scan_id)
+        if entry and _is_cache_fresh(entry) and "engine" in entry:
+            return entry, entry["engine"]
+        stored = scan_store.load(scan_id)
+        if stored is None:
+            return None
+        result, engine, appended = stored
+        return _cache_put(scan_id, result, engine, appended), engine
+
+def _new_scan_id(file_hash: str) -> str:
+    """The scan id for a fresh analysis: the file hash, unless a scan appended to since already holds it."""
+    entry = _result_cache.get(file_hash)
+    if (entry and entry["appended"]) or (scan_store is not None and scan_store.appended(file_hash)):
+        return f"{file_hash}-{uuid.uuid4().hex[:8]}"
+    return file_hash
+
+def _run_engine(upload) -> tuple[dict[str, Any], FraudEngine]:
+    """CPU-bound work — runs in thread pool (which hands it to the process pool when enabled).
+
+    CSVs large enough to stream are analysed here even in process mode:
+    handing one to a worker would need the whole file in memory.
+    """
+    if analysis_pool is not None and not FraudEngine.streams_upload(upload):
+        result, engine = analysis_pool.analyze_upload(upload)
+    else:
+        engine = FraudEngine.from_upload_file(upload)
+        result = engine.run_analysis()
     # Persist rings to MongoDB (fire-and-forget)
     if collection is not None:
         for ring in result.get("fraud_rings", []):  # ring: dict[str, Any]
@@ -91,7 +265,7 @@ def _run_engine(csv_bytes: bytes) -> dict[str, Any]:
                 collection.update_one({"ring_id": ring_dict["ring_id"]}, {"$set": ring_dict}, upsert=True)
             except Exception:
                 pass
-    return result
+    return result, engine
 
 
 # ── Routes ───────────────────────────────────────────────────────────────
@@ -104,42 +278,61 @@ def home():
     }
 
 
-@app.post("/api/analyze")
-async def analyze_csv(file: UploadFile = File(...)):
-    """Upload a CSV and get instant fraud analysis. Results are cached by file hash."""
-    raw = await file.read()
-    if not raw:
-        raise HTTPException(status_code=400, detail="Empty file")
+@app.get("/api/metrics")
+def get_metrics():
+    """Prometheus metrics: stage latency, cache lookups and hit ratio, executor queue depth, response sizes."""
+    return Response(registry.render(), media_type=PROMETHEUS_MEDIA_TYPE)
 
-    file_hash = _hash_bytes(raw)
 
-    # ── Cache hit: return instantly ──────────────────────────────────────
-    if file_hash in _result_cache and _is_cache_fresh(_result_cache[file_hash]):
-        entry = _result_cache[file_hash]
-        return {**entry["data"], "cached": True}
+@app.post("/api/analyze", response_class=FastJSONResponse)
+async def analyze_csv(file: UploadFile = File(...), fmt: Optional[str] = Query(None, alias="format"),
+                      timings: bool = False, accept: Optional[str] = Header(None)):
+    """
+    Upload a CSV, Parquet or Arrow IPC ledger and get instant fraud analysis. Results are cached by file hash.
+    Use ?format=columnar|msgpack (or the matching Accept type) for a compact columnar graph,
+    or ?format=ndjson (Accept: application/x-ndjson) to stream the result as NDJSON records.
+    ?timings=true adds a "timings" block: per-stage milliseconds and row/edge counts of the run.
+    """
+    fmt = _graph_format(fmt, accept)
+    file_hash, size = await _offload(_hash_file, file.file)   # the spooled upload, never read whole here
+    if not size:
+        raise HTTPException(status_code=400, detail="Empty file")
+
+    # ── Cache hit: return instantly (unless appended to since) ──────────
+    entry = await _offload(_cache_hit, file_hash)   # may load the scan from the store
+    if entry is not None:
+        CACHE_LOOKUPS.inc(result="hit")
+        return _respond({**entry["data"], "cached": True, **_timings(entry["engine"], timings)}, fmt)
+    CACHE_LOOKUPS.inc(result="miss")
 
     # ── Run analysis in thread pool so event loop stays free ─────────────
-    loop = asyncio.get_event_loop()
     try:
-        result = await loop.run_in_executor(executor, _run_engine, raw)
+        result, engine = await _offload(_run_engine, file.file)
     except ValueError as e:
         raise HTTPException(status_code=422, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Engine error: {str(e)}")
 
-    _result_cache[file_hash] = {"data": result, "ts": time.time()}
-    return {**result, "cached": False}
+    _observe_run(engine.timings)
+    result["scan_id"] = scan_id = _new_scan_id(file_hash)
+    _store_scan(scan_id, _cache_put(scan_id, result, engine))
+    return _respond({**result, "cached": False, **_timings(engine, timings)}, fmt)
 
 
-@app.get("/api/demo")
-async def get_demo_data(mode: str = "fiat"):
+@app.get("/api/demo", response_class=FastJSONResponse)
+async def get_demo_data(mode: str = "fiat", fmt: Optional[str] = Query(None, alias="format"), timings: bool = False,
+                        accept: Optional[str] = Header(None)):
     """
     Returns pre-generated synthetic fraud data instantly — no file upload needed.
-    Use ?mode=crypto for crypto-style addresses.
+    Use ?mode=crypto for crypto-style addresses; ?format= and ?timings= work as for /api/analyze.
     """
+    fmt = _graph_format(fmt, accept)
     cache_key = f"__demo_{mode}"
-    if cache_key in _result_cache and _is_cache_fresh(_result_cache[cache_key]):
-        return {**_result_cache[cache_key]["data"], "cached": True, "demo": True}
+    entry = await _offload(_cache_hit, cache_key)
+    if entry is not None:
+        CACHE_LOOKUPS.inc(result="hit")
+        return _respond({**entry["data"], "cached": True, "demo": True, **_timings(entry["engine"], timings)}, fmt)
+    CACHE_LOOKUPS.inc(result="miss")
 
     is_crypto = mode == "crypto"
 
@@ -153,16 +346,100 @@ async def get_demo_data(mode: str = "fiat"):
             try:
                 generate_synthetic_data(num_normal=300, is_crypto=is_crypto)
                 fname = "crypto_ledger_demo.csv" if is_crypto else "fiat_banking_demo.csv"
-                df = pd.read_csv(fname)
+                df = read_csv(fname, FraudConfig.CSV_PARSER_BACKEND)
             finally:
                 os.chdir(orig_dir)
+        if analysis_pool is not None:
+            return analysis_pool.analyze_frame(df)
         engine = FraudEngine(df)
-        return engine.run_analysis()
+        return engine.run_analysis(), engine
+
+    result, engine = await _offload(_build_demo)
+    _observe_run(engine.timings)
+    result["scan_id"] = scan_id = _new_scan_id(cache_key)
+    _store_scan(scan_id, _cache_put(scan_id, result, engine))
+    return _respond({**result, "cached": False, "demo": True, **_timings(engine, timings)}, fmt)
+
+
+def _cached_scan(scan_id: str) -> tuple[dict, FraudEngine]:
+    """A scan's cache entry and engine (read once: the cache may drop it meanwhile), loaded from the store
+    if the cache let it go; 404 if neither has it."""
+    entry = _result_cache.get(scan_id)
+    engine = entry.get("engine") if entry and _is_cache_fresh(entry) else None
+    if engine is not None:
+        return entry, engine
+    restored = _restore_scan(scan_id)
+    if restored is None:
+        raise HTTPException(status_code=404, detail="Scan not found or expired. Run /api/analyze again.")
+    return restored
+
+def _lookup_nodes(scan_id: str, account_ids: list[str]) -> tuple[dict, list]:
+    entry, engine = _cached_scan(scan_id)
+    with entry["lock"]:   # appends swap the ledger the node index is built on
+        return engine.node_store.lookup(account_ids)
+
+
+@app.get("/api/scan/{scan_id}/node/{account_id}")
+def get_node_detail(scan_id: str, account_id: str):
+    """History, metadata and totals for one account of a cached scan."""
+    nodes, _ = _lookup_nodes(scan_id, [account_id])
+    if account_id not in nodes:
+        raise HTTPException(status_code=404, detail=f"Account {account_id} not in scan {scan_id}")
+    return nodes[account_id]
+
+
+@app.post("/api/scan/{scan_id}/nodes")
+def get_node_details(scan_id: str, request: dict = Body(...)):
+    """
+    Batch node details: body {"account_ids": [...]}.
+    Returns {"nodes": {account_id: detail}, "missing": [ids not in the scan]}.
+    """
+    account_ids = request.get("account_ids", [])
+    if not isinstance(account_ids, list) or not all(isinstance(a, str) for a in account_ids):
+        raise HTTPException(status_code=422, detail="account_ids must be a list of strings")
+    if len(account_ids) > NODE_BATCH_MAX:
+        raise HTTPException(status_code=413, detail=f"At most {NODE_BATCH_MAX} account_ids per request")
+    nodes, missing = _lookup_nodes(scan_id, list(dict.fromkeys(account_ids)))
+    return {"nodes": nodes, "missing": missing}
+
+
+@app.post("/api/scan/{scan_id}/append", response_class=FastJSONResponse)
+async def append_rows(scan_id: str, file: UploadFile = File(...), timings: bool = False):
+    """
+    Append new ledger rows (CSV, Parquet or Arrow IPC) to a cached scan. Only the smurfing hubs,
+    velocity senders, round-trip pairs and cycles the new rows touch are re-evaluated.
+    Returns {"rows_appended", "new_accounts", "updated_accounts": [flagged-entity rows], "analytics"};
+    ?timings=true adds the append's "timings" block.
+    """
+    entry, engine = await _offload(_cached_scan, scan_id)
+    raw = await file.read()
+    if not raw:
+        raise HTTPException(status_code=400, detail="Empty file")
+
+    def _append():
+        start = time.perf_counter()
+        df = read_upload(raw, FraudConfig.CSV_PARSER_BACKEND)
+        parsed = time.perf_counter() - start
+        with entry["lock"]:
+            result = engine.append(df)
+            engine.timings.add("parse", parsed)
+            # The cached payload (graph, rings) stays as analysed; only its analytics follow the appends
+            entry["data"] = {**entry["data"], "analytics": {**entry["data"]["analytics"], **result["analytics"]}}
+            entry["appended"] = True
+            if scan_store is not None:
+                scan_store.record_append(scan_id, raw, engine, entry["data"])
+            return result, engine.timings
+
+    try:
+        result, run_timings = await _offload(_append)
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Engine error: {str(e)}")
 
-    loop = asyncio.get_event_loop()
-    result = await loop.run_in_executor(executor, _build_demo)
-    _result_cache[cache_key] = {"data": result, "ts": time.time()}
-    return {**result, "cached": False, "demo": True}
+    entry["ts"] = time.time()
+    _observe_run(run_timings)
+    return FastJSONResponse({"scan_id": scan_id, **result, **({"timings": run_timings.as_dict()} if timings else {})})
 
 
 @app.post("/api/chat")
@@ -180,8 +457,7 @@ async def chat_agent(request: dict = Body(...)):
         "Reply in 2-3 concise, professional sentences."
     )
     try:
-        loop = asyncio.get_event_loop()
-        response = await loop.run_in_executor(executor, model.generate_content, prompt)
+        response = await _offload(model.generate_content, prompt)
         return {"response": response.text}
     except Exception as e:
         return {"response": f"AI Error: {str(e)}"}
@@ -198,7 +474,7 @@ async def export_flagged_csv(cache_key: str = ""):
     entry = _result_cache.get(cache_key)
     if not entry:
         # Use the most recent fresh entry
-        fresh = [(k, v) for k, v in _result_cache.items() if _is_cache_fresh(v) and "data" in v]
+        fresh = [(k, v) for k, v in list(_result_cache.items()) if _is_cache_fresh(v) and "data" in v]
         if not fresh:
             raise HTTPException(status_code=404, detail="No scan result in cache. Run /api/analyze first.")
         entry = max(fresh, key=lambda kv: kv[1]["ts"])[1]
@@ -223,16 +499,16 @@ async def export_flagged_csv(cache_key: str = ""):
     )
 
 
-@app.get("/api/network-stats")
+@app.get("/api/network-stats", response_class=FastJSONResponse)
 def get_network_stats():
     """Return network-level health metrics from the most recent scan."""
-    fresh = [(k, v) for k, v in _result_cache.items() if _is_cache_fresh(v) and "data" in v]
+    fresh = [(k, v) for k, v in list(_result_cache.items()) if _is_cache_fresh(v) and "data" in v]
     if not fresh:
-        return {"error": "No scan data available. Run /api/analyze first."}
+        return FastJSONResponse({"error": "No scan data available. Run /api/analyze first."})
     entry = max(fresh, key=lambda kv: kv[1]["ts"])[1]
     analytics = entry["data"].get("analytics", {})
     breakdown = entry["data"].get("fraud_type_breakdown", {})
-    return {"analytics": analytics, "fraud_type_breakdown": breakdown}
+    return FastJSONResponse({"analytics": analytics, "fraud_type_breakdown": breakdown})
 
 
 @app.delete("/api/cache")
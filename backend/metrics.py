@@ -0,0 +1,143 @@
+import bisect
+import math
+import threading
+import time
+from contextlib import contextmanager
+
+# Histogram bucket upper bounds
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)   # seconds
+SIZE_BUCKETS = (1e3, 1e4, 1e5, 5e5, 1e6, 5e6, 1e7, 5e7, 1e8)                                 # bytes
+DEPTH_BUCKETS = (0, 1, 2, 4, 8, 16, 32, 64)                                                 # jobs
+PROMETHEUS_MEDIA_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+# ── Per-run timings ─────────────────────────────────────────────────────
+class Timings:
+    """Stage durations and row/edge counters for one engine run.
+
+    Stages may nest and may be timed from detector threads; repeated names
+    accumulate. Counters keep the last value set.
+    """
+
+    def __init__(self):
+        self.stages = {}   # stage -> seconds
+        self.counts = {}   # counter -> value
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def stage(self, name: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(name, time.perf_counter() - start)
+
+    def add(self, name: str, seconds: float):
+        with self._lock:
+            self.stages[name] = self.stages.get(name, 0.0) + seconds
+
+    def count(self, name: str, value: int):
+        with self._lock:
+            self.counts[name] = int(value)
+
+    def as_dict(self) -> dict:
+        with self._lock:
+            return {"stages_ms": {k: round(v * 1000, 2) for k, v in self.stages.items()}, "counts": dict(self.counts)}
+
+    def __getstate__(self) -> dict:
+        return {"stages": self.stages, "counts": self.counts}
+
+    def __setstate__(self, state: dict):
+        self.__init__()
+        self.stages, self.counts = state["stages"], state["counts"]
+
+
+# ── Prometheus text exposition ──────────────────────────────────────────
+def _labels(names: tuple, values: tuple, extra: str = '') -> str:
+    pairs = [f'{k}="{v}"' for k, v in zip(names, values)] + ([extra] if extra else [])
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def _value(v: float) -> str:
+    return '+Inf' if v == math.inf else repr(float(v))
+
+
+class _Metric:
+    kind = 'untyped'
+
+    def __init__(self, registry: 'Registry', name: str, help: str, labels: tuple = ()):
+        self.name, self.help, self.labelnames = name, help, tuple(labels)
+        self._series = {}   # label values -> state
+        self._lock = threading.Lock()
+        registry.metrics.append(self)
+
+    def _key(self, labels: dict) -> tuple:
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def render(self) -> list[str]:
+        lines = [f'# HELP {self.name} {self.help}', f'# TYPE {self.name} {self.kind}']
+        with self._lock:
+            for key, state in sorted(self._series.items()):
+                lines.extend(self._lines(key, state))
+        return lines
+
+
+class Counter(_Metric):
+    kind = 'counter'
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._series[key] = self._series.get(key, 0) + amount
+
+    def value(self, **labels) -> float:
+        return self._series.get(self._key(labels), 0)
+
+    def _lines(self, key, total):
+        return [f'{self.name}{_labels(self.labelnames, key)} {_value(total)}']
+
+
+class Gauge(_Metric):
+    """Gauge read from a callback at scrape time."""
+    kind = 'gauge'
+
+    def __init__(self, registry: 'Registry', name: str, help: str, read):
+        super().__init__(registry, name, help)
+        self._series = {(): read}
+
+    def _lines(self, key, read):
+        return [f'{self.name} {_value(read())}']
+
+
+class Histogram(_Metric):
+    kind = 'histogram'
+
+    def __init__(self, registry: 'Registry', name: str, help: str, buckets: tuple, labels: tuple = ()):
+        super().__init__(registry, name, help, labels)
+        self.buckets = tuple(buckets) + (math.inf,)
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            counts, total = self._series.get(key, ([0] * len(self.buckets), 0.0))
+            counts[bisect.bisect_left(self.buckets, value)] += 1
+            self._series[key] = (counts, total + value)
+
+    def _lines(self, key, state):
+        counts, total = state
+        lines, cumulative = [], 0
+        for bound, n in zip(self.buckets, counts):
+            cumulative += n
+            le = f'le="{_value(bound)}"'
+            lines.append(f'{self.name}_bucket{_labels(self.labelnames, key, le)} {cumulative}')
+        lines.append(f'{self.name}_sum{_labels(self.labelnames, key)} {_value(total)}')
+        lines.append(f'{self.name}_count{_labels(self.labelnames, key)} {cumulative}')
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self.metrics = []
+
+    def render(self) -> str:
+        return '\n'.join(line for metric in self.metrics for line in metric.render()) + '\n'
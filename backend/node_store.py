@@ -0,0 +1,80 @@
+import numpy as np
+import pandas as pd
+
+from account_table import AccountTable
+
+HISTORY_LIMIT = 30   # transfers listed per account
+
+
+class NodeStore:
+    """Per-scan index of every account's transfers for on-demand node details.
+
+    Each transfer appears once under its sender and once under its receiver;
+    entries are grouped by account code (ptr[code]:ptr[code + 1]) and kept in
+    ledger order, with a self-transfer listed as SENT then RECEIVED.
+    """
+
+    def __init__(self, df: pd.DataFrame, accounts: AccountTable, metadata_cols: list[str]):
+        self.df = df
+        self.accounts = accounts
+        self.metadata_cols = metadata_cols
+        senders = df['sender_code'].to_numpy(np.int64)
+        receivers = df['receiver_code'].to_numpy(np.int64)
+        rows = np.arange(len(df))
+
+        node = np.concatenate([senders, receivers])
+        row = np.concatenate([rows, rows])
+        received = np.repeat([False, True], len(df))
+        order = np.lexsort((received, row, node))
+        self.row, self.received = row[order], received[order]
+        self.counterparty = np.concatenate([receivers, senders])[order]
+        self.ptr = np.searchsorted(node[order], np.arange(len(accounts) + 1))
+
+    def _entries(self, codes: np.ndarray, limit: int | None = None) -> tuple[np.ndarray, np.ndarray]:
+        """(owning code, entry position) for the first `limit` entries of each code."""
+        lo, hi = self.ptr[codes], self.ptr[codes + 1]
+        if limit is not None:
+            hi = np.minimum(hi, lo + limit)
+        counts = hi - lo
+        offsets = np.concatenate([[0], np.cumsum(counts)])
+        pos = np.repeat(lo - offsets[:-1], counts) + np.arange(offsets[-1])
+        return np.repeat(codes, counts), pos
+
+    def details(self, codes) -> dict[int, dict]:
+        """History and last-seen metadata for each code; only these accounts' rows are touched."""
+        codes = np.unique(np.asarray(codes, dtype=np.int64))
+        out = {code: {"history": [], "metadata": {}} for code in codes.tolist()}
+        if not len(codes):
+            return out
+        ids = self.accounts.ids
+
+        owner, pos = self._entries(codes, HISTORY_LIMIT)
+        rows, received = self.row[pos], self.received[pos]
+        amounts = self.df['amount'].to_numpy()[rows].tolist()
+        times = self.df['timestamp'].iloc[rows].astype(str).tolist()
+        for code, recv, cp, amt, time in zip(owner.tolist(), received.tolist(), ids[self.counterparty[pos]].tolist(), amounts, times):
+            out[code]["history"].append({'type': 'RECEIVED' if recv else 'SENT', 'counterparty': str(cp), 'amount': amt, 'time': time})
+
+        if self.metadata_cols:
+            owner, pos = self._entries(codes)
+            meta = self.df[self.metadata_cols].iloc[self.row[pos]].set_axis(owner).groupby(level=0, sort=False).last()
+            for code, values in zip(meta.index.tolist(), meta.to_dict('records')):
+                out[code]["metadata"] = {str(k).upper(): str(v) for k, v in values.items() if pd.notna(v)}
+        return out
+
+    def lookup(self, account_ids: list[str]) -> tuple[dict[str, dict], list[str]]:
+        """Full detail records keyed by account id, plus the ids not present in this scan."""
+        codes = self.accounts.codes_of(account_ids)
+        known = codes >= 0
+        found = self.details(codes[known])
+        accounts = self.accounts
+        nodes = {}
+        for account_id, code in zip(np.asarray(account_ids)[known].tolist(), codes[known].tolist()):
+            nodes[account_id] = {
+                "account_id": account_id,
+                "total_sent": float(accounts.sent[code]),
+                "total_received": float(accounts.received[code]),
+                **found[code],
+            }
+        missing = [account_id for account_id, ok in zip(account_ids, known.tolist()) if not ok]
+        return nodes, missing
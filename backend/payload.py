@@ -0,0 +1,141 @@
+import json
+from datetime import date, datetime
+
+import numpy as np
+from fastapi.responses import JSONResponse
+
+try:
+    import msgpack
+    MSGPACK_AVAILABLE = True
+except ImportError:
+    MSGPACK_AVAILABLE = False
+
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
+
+# Response formats for the graph section of an analysis result
+GRAPH_FORMATS = ('cytoscape', 'columnar', 'msgpack', 'ndjson')
+COLUMNAR_MEDIA_TYPE = 'application/vnd.fraudgraph.columnar+json'
+MSGPACK_MEDIA_TYPE = 'application/x-msgpack'
+NDJSON_MEDIA_TYPE = 'application/x-ndjson'
+NDJSON_CHUNK_SIZE = 1000      # graph elements / flagged entities per streamed record
+STRING_FIELDS = {'id', 'label', 'country', 'fraud_type'}   # node fields stored as string-table indexes
+
+
+def negotiate_format(fmt: str | None, accept: str | None) -> str:
+    """Graph format from an explicit ?format= value, else the Accept header; Cytoscape by default."""
+    if fmt:
+        if fmt not in GRAPH_FORMATS:
+            raise ValueError(f"Unknown format {fmt!r}; expected one of {', '.join(GRAPH_FORMATS)}")
+        return fmt
+    accept = accept or ''
+    if NDJSON_MEDIA_TYPE in accept:
+        return 'ndjson'
+    if MSGPACK_MEDIA_TYPE in accept:
+        return 'msgpack'
+    if COLUMNAR_MEDIA_TYPE in accept:
+        return 'columnar'
+    return 'cytoscape'
+
+
+def columnar_graph(graph_data: list[dict]) -> dict:
+    """Cytoscape element list -> parallel node/edge arrays sharing one string table.
+
+    Node ids, labels, countries and fraud types are indexes into `strings`;
+    edge endpoints are node row numbers and amounts are the engine's
+    unrounded floats (amount_value), not the two-decimal display strings.
+    """
+    strings, lookup = [], {}
+
+    def intern(value: str) -> int:
+        if value not in lookup:
+            lookup[value] = len(strings)
+            strings.append(value)
+        return lookup[value]
+
+    nodes = [el['data'] for el in graph_data if 'source' not in el['data']]
+    edges = [el['data'] for el in graph_data if 'source' in el['data']]
+
+    node_cols = {key: [] for node in nodes for key in node}
+    for node in nodes:
+        for key, col in node_cols.items():
+            value = node.get(key)
+            col.append(intern(value) if key in STRING_FIELDS and value is not None else value)
+    row_of = {node['id']: i for i, node in enumerate(nodes)}
+
+    edge_cols = {
+        "source": [row_of[e['source']] for e in edges],
+        "target": [row_of[e['target']] for e in edges],
+        "amount": [e['amount_value'] for e in edges],
+        "timestamp": [e['timestamp'] for e in edges],
+        "is_fraudulent": [e['is_fraudulent'] for e in edges],
+    }
+    return {"strings": strings, "nodes": node_cols, "edges": edge_cols}
+
+
+def encode_graph(result: dict, fmt: str) -> dict:
+    """Analysis result with graph_data swapped for the columnar `graph` when requested."""
+    if fmt in ('cytoscape', 'ndjson'):
+        return result
+    body = {k: v for k, v in result.items() if k != 'graph_data'}
+    body["graph_format"] = "columnar"
+    body["graph"] = columnar_graph(result["graph_data"])
+    return body
+
+
+def to_msgpack(body: dict) -> bytes:
+    if not MSGPACK_AVAILABLE:
+        raise RuntimeError("msgpack is not installed")
+    return msgpack.packb(body, use_bin_type=True)
+
+
+def iter_ndjson(result: dict, chunk_size: int = NDJSON_CHUNK_SIZE):
+    """Stream an analysis result as newline-delimited JSON records, one serialized at a time.
+
+    Order: a "summary" record (analytics, top rings, breakdown, scan info),
+    then "nodes" and "edges" chunks of Cytoscape elements, the "timeline",
+    "flagged_entities" chunks and a closing "end" record with the counts.
+    """
+    bulky = ('graph_data', 'timeline', 'flagged_entities')
+    yield dumps_json({"type": "summary", **{k: v for k, v in result.items() if k not in bulky}}) + b'\n'
+
+    elements = result.get('graph_data', [])
+    nodes = [el for el in elements if 'source' not in el['data']]
+    edges = [el for el in elements if 'source' in el['data']]
+    for kind, items in (('nodes', nodes), ('edges', edges)):
+        for i in range(0, len(items), chunk_size):
+            yield dumps_json({"type": kind, "data": items[i:i + chunk_size]}) + b'\n'
+
+    yield dumps_json({"type": "timeline", "data": result.get('timeline', [])}) + b'\n'
+    flagged = result.get('flagged_entities', [])
+    for i in range(0, len(flagged), chunk_size):
+        yield dumps_json({"type": "flagged_entities", "data": flagged[i:i + chunk_size]}) + b'\n'
+    yield dumps_json({"type": "end", "nodes": len(nodes), "edges": len(edges), "flagged_entities": len(flagged)}) + b'\n'
+
+
+# ── Fast JSON ───────────────────────────────────────────────────────────
+def _json_default(obj):
+    if isinstance(obj, np.generic):
+        return obj.item()
+    if isinstance(obj, np.ndarray):
+        return obj.tolist()
+    if isinstance(obj, (datetime, date)):
+        return obj.isoformat()   # pd.Timestamp included, as jsonable_encoder does
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+def dumps_json(obj) -> bytes:
+    """Compact JSON bytes; orjson when installed, NumPy scalars/arrays and timestamps handled either way."""
+    if ORJSON_AVAILABLE:
+        return orjson.dumps(obj, default=_json_default, option=orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS)
+    return json.dumps(obj, default=_json_default, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+
+class FastJSONResponse(JSONResponse):
+    """JSONResponse that skips jsonable_encoder; return it directly from the endpoint."""
+
+    def render(self, content) -> bytes:
+        return dumps_json(content)
@@ -0,0 +1,106 @@
+import os
+import pickle
+import re
+import shutil
+import time
+
+from engine import FraudEngine
+from ingest import read_upload
+
+SCAN_ID_PATTERN = re.compile(r'[A-Za-z0-9_-]{1,128}')   # scan ids double as directory names
+STATE_FILE = 'state.pkl'
+APPENDED_MARK = 'appended'
+APPENDS_DIR = 'appends'
+
+
+class ScanStore:
+    """Analysed scans on disk, so they outlive the response cache and a restart.
+
+    Each scan is a directory named by its scan_id. state.pkl holds the engine
+    and its response payload; every append adds its raw upload to appends/,
+    so an append writes only its own rows. Loading unpickles the state and
+    replays the appends. Once compact_after appends have piled up, the state
+    is rewritten and the log dropped. Scans untouched for retention_s are
+    deleted as new ones are saved.
+    """
+
+    def __init__(self, root: str, retention_s: float, compact_after: int = 16, parser_backend: str = 'auto'):
+        self.root = root
+        self.retention_s = retention_s
+        self.compact_after = compact_after
+        self.parser_backend = parser_backend
+
+    def _dir(self, scan_id: str) -> str | None:
+        return os.path.join(self.root, scan_id) if SCAN_ID_PATTERN.fullmatch(scan_id) else None
+
+    def save(self, scan_id: str, engine: FraudEngine, result: dict, appended: bool = False):
+        """Write a scan's full state, replacing any earlier state and append log."""
+        path = self._dir(scan_id)
+        if path is None:
+            raise ValueError(f"Invalid scan id {scan_id!r}")
+        os.makedirs(path, exist_ok=True)
+        _write(os.path.join(path, STATE_FILE), pickle.dumps((result, engine), protocol=pickle.HIGHEST_PROTOCOL))
+        shutil.rmtree(os.path.join(path, APPENDS_DIR), ignore_errors=True)
+        if appended:
+            _write(os.path.join(path, APPENDED_MARK), b'')
+        self.prune()
+
+    def record_append(self, scan_id: str, raw: bytes, engine: FraudEngine, result: dict):
+        """Log an append already applied to `engine`; compacts into a new state once the log is long enough.
+
+        A scan without a saved state is skipped: its pending save() snapshots the engine, append included.
+        """
+        path = self._dir(scan_id)
+        if path is None or not os.path.exists(os.path.join(path, STATE_FILE)):
+            return
+        log = os.path.join(path, APPENDS_DIR)
+        os.makedirs(log, exist_ok=True)
+        seq = len(_logged(log))
+        if seq + 1 >= self.compact_after:
+            self.save(scan_id, engine, result, appended=True)
+            return
+        _write(os.path.join(log, f"{seq:06d}.bin"), raw)
+        _write(os.path.join(path, APPENDED_MARK), b'')
+
+    def appended(self, scan_id: str) -> bool:
+        path = self._dir(scan_id)
+        return path is not None and os.path.exists(os.path.join(path, APPENDED_MARK))
+
+    def load(self, scan_id: str) -> tuple[dict, FraudEngine, bool] | None:
+        """(payload, engine, appended) of a stored scan with its appends replayed; None if it isn't stored."""
+        path = self._dir(scan_id)
+        if path is None or not os.path.exists(os.path.join(path, STATE_FILE)):
+            return None
+        with open(os.path.join(path, STATE_FILE), 'rb') as f:
+            result, engine = pickle.load(f)
+        log = os.path.join(path, APPENDS_DIR)
+        for name in _logged(log):
+            with open(os.path.join(log, name), 'rb') as f:
+                appended = engine.append(read_upload(f.read(), self.parser_backend))
+            result = {**result, "analytics": {**result["analytics"], **appended["analytics"]}}
+        os.utime(path)
+        return result, engine, self.appended(scan_id)
+
+    def prune(self):
+        """Delete scans untouched (saved, appended to or loaded) for retention_s."""
+        cutoff = time.time() - self.retention_s
+        for name in os.listdir(self.root):
+            path = os.path.join(self.root, name)
+            try:
+                if os.path.isdir(path) and os.path.getmtime(path) < cutoff:
+                    shutil.rmtree(path, ignore_errors=True)
+            except FileNotFoundError:
+                pass
+
+
+def _logged(log: str) -> list[str]:
+    """Append files in replay order."""
+    return sorted(name for name in os.listdir(log) if name.endswith('.bin')) if os.path.isdir(log) else []
+
+
+def _write(path: str, data: bytes):
+    """Write via a temp file and rename, so readers never see a partial file."""
+    tmp = f"{path}.tmp"
+    with open(tmp, 'wb') as f:
+        f.write(data)
+    os.replace(tmp, path)
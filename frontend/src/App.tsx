@@ -29,6 +29,7 @@ interface AnalysisResults {
   timeline: { date: string; volume: number; count: number; flagged: number }[];
   fraud_type_breakdown: Record<string, number>;
   flagged_entities: any[];
+  scan_id?: string;
 }
 
 function cn(...classes: (string | boolean | undefined)[]) { 
@@ -528,6 +529,23 @@ export function App() {
     const nodeData = evt.target.data();
     setSelectedNode(nodeData);
     setActiveRing(null);
+    // History and metadata are served on demand rather than inlined in the scan payload
+    if (nodeData.history === undefined && results?.scan_id) {
+      fetch(`${API_URL}/api/scan/${encodeURIComponent(results.scan_id)}/node/${encodeURIComponent(nodeData.id)}`)
+        .then(res => {
+          if (res.ok) return res.json();
+          // Scans are only held server-side for a while (and only the newest few)
+          showToast(res.status === 404 ? "⌛ This scan has expired on the server — re-run the analysis to load account details"
+                                       : "🚨 Could not load account details");
+          return null;
+        })
+        .then(detail => {
+          if (!detail) return;
+          evt.target.data({ history: detail.history, metadata: detail.metadata });
+          setSelectedNode((prev: any) => prev && prev.id === nodeData.id ? { ...prev, ...detail } : prev);
+        })
+        .catch(() => showToast("🚨 Could not load account details"));
+    }
   };
 
   const handleRingClick = (ring: any) => {